@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Employee, Department, LeaveType, LeaveRequest
+from .models import Employee, Department, LeaveType, LeaveRequest, LeaveBalance, Holiday, LeaveAccrualSnapshot, Office
 
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
@@ -13,9 +13,15 @@ class EmployeeAdmin(admin.ModelAdmin):
 class DepartmentAdmin(admin.ModelAdmin):
     list_display = ("id", "name")
 
+@admin.register(Office)
+class OfficeAdmin(admin.ModelAdmin):
+    list_display = ("name", "latitude", "longitude", "radius_meters", "timezone", "is_active")
+    list_filter = ("is_active", "timezone")
+    search_fields = ("name",)
+
 @admin.register(LeaveType)
 class LeaveTypeAdmin(admin.ModelAdmin):
-    list_display = ("name", "max_days_per_year", "requires_approval", "is_active")
+    list_display = ("name", "max_days_per_year", "monthly_accrual", "carry_forward_cap", "requires_approval", "is_active")
     list_filter = ("is_active", "requires_approval")
     search_fields = ("name",)
 
@@ -37,3 +43,23 @@ class LeaveRequestAdmin(admin.ModelAdmin):
             "fields": ("created_at", "updated_at")
         }),
     )
+
+@admin.register(LeaveBalance)
+class LeaveBalanceAdmin(admin.ModelAdmin):
+    list_display = ("employee", "leave_type", "year", "used", "pending", "updated_at")
+    list_filter = ("year", "leave_type")
+    search_fields = ("employee__user__name", "employee__employee_id")
+    readonly_fields = ("used", "pending", "updated_at")
+
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    list_display = ("date", "name")
+    list_filter = ("date",)
+    search_fields = ("name",)
+
+@admin.register(LeaveAccrualSnapshot)
+class LeaveAccrualSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("employee", "leave_type", "period", "carried_forward", "accrued", "entitlement")
+    list_filter = ("period", "leave_type")
+    search_fields = ("employee__user__name", "employee__employee_id")
+    readonly_fields = ("carried_forward", "accrued", "entitlement", "updated_at")
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.apps import apps
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+# Authenticated tokens remembered per process. Edits made through User/Employee
+# save() and logout clear entries at once in this process; the TTL bounds how
+# long other processes can keep serving the old values.
+AUTH_CACHE_SIZE = 2048
+AUTH_CACHE_SECONDS = 60
+
+
+class _TokenCache:
+    """Bounded LRU of token key -> (expires, token, employee)."""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1:]
+
+    def put(self, key, token, employee):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + AUTH_CACHE_SECONDS, token, employee)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def discard(self, key=None, user_id=None):
+        with self.lock:
+            if key is not None:
+                self.entries.pop(key, None)
+            if user_id is not None:
+                for cached_key in [k for k, entry in self.entries.items() if entry[1].user_id == user_id]:
+                    del self.entries[cached_key]
+
+
+_token_cache = _TokenCache(AUTH_CACHE_SIZE)
+
+
+def forget_token(key):
+    _token_cache.discard(key=key)
+
+
+def forget_user(user_id):
+    _token_cache.discard(user_id=user_id)
+
+
+def forget_all():
+    _token_cache.clear()
+
+
+class EmployeeTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that also resolves the caller's Employee.
+
+    Token, user, employee and department come from one joined query (or the
+    cache), and the employee is exposed as ``request.employee`` (None for
+    users without an employee profile) so views need no lookup of their own;
+    views read it through get_request_employee().
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            # Set on the Django request; the DRF Request proxies attribute reads to it
+            request._request.employee = self._employee
+        return result
+
+    def authenticate_credentials(self, key):
+        cached = _token_cache.get(key)
+        if cached is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related("user__employee__department").get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            employee = getattr(token.user, "employee", None)
+            _token_cache.put(key, token, employee)
+        else:
+            token, employee = cached
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        self._employee = employee
+        return (token.user, token)
+
+
+def get_request_employee(request):
+    """The authenticated caller's Employee, or None.
+
+    Taken from ``request.employee`` when EmployeeTokenAuthentication set it;
+    any other authentication (sessions, tests) falls back to one lookup,
+    remembered on the request.
+    """
+    django_request = getattr(request, "_request", request)
+    if not hasattr(django_request, "employee"):
+        employee = None
+        if request.user.is_authenticated:
+            Employee = apps.get_model("Attendanceapp", "Employee")
+            employee = Employee.objects.select_related("department").filter(user=request.user).first()
+        django_request.employee = employee
+    return django_request.employee
@@ -0,0 +1,260 @@
+import csv
+import hashlib
+import os
+import tempfile
+import time
+from itertools import chain, islice
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import AttendanceDailySummary, Employee, ExportJob, LeaveRequest, ReportDataVersion
+from .reports import EXPORT_HEADERS, iter_report_rows
+
+# Rows inspected to size the columns before streaming the rest
+WIDTH_SAMPLE_ROWS = 500
+
+# Rows written between progress updates on an ExportJob
+PROGRESS_EVERY_ROWS = 1000
+
+# Rows per Parquet row group; bounds memory while writing
+PARQUET_BATCH_ROWS = 10000
+
+EXPORT_CONTENT_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+PARQUET_COLUMNS = [
+    "date", "employee_id", "employee_name", "department", "check_in", "check_out",
+    "status", "working_hours", "permissions", "remarks",
+]
+
+
+def column_widths(rows):
+    """Column widths (longest value + 5) for a bounded list of rows."""
+    widths = {}
+    for row in rows:
+        for index, value in enumerate(row, start=1):
+            if value:
+                widths[index] = max(widths.get(index, 0), len(str(value)) + 5)
+    return widths
+
+
+def write_xlsx(rows, output=None, title="Attendance Report"):
+    """Write ``AttendanceRow``s to a write-only workbook.
+
+    Column widths have to be set before the first row in write-only mode, so
+    they are taken from the first ``WIDTH_SAMPLE_ROWS`` rows only. Without an
+    ``output`` file the workbook is spooled to a temporary file, which is
+    returned rewound and ready to stream.
+    """
+    rows = (row.as_export_row() for row in rows)
+    sample = list(islice(rows, WIDTH_SAMPLE_ROWS))
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    for index, width in column_widths([EXPORT_HEADERS] + sample).items():
+        ws.column_dimensions[get_column_letter(index)].width = width
+
+    ws.append(EXPORT_HEADERS)
+    for row in chain(sample, rows):
+        ws.append(row)
+
+    if output is None:
+        output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+class _Echo:
+    """File-like object whose write() hands the CSV line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """Yield the report as CSV lines, one per ``AttendanceRow``, for StreamingHttpResponse."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADERS)
+    for row in rows:
+        yield writer.writerow(row.as_export_row())
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def write_parquet(rows, output=None):
+    """Write ``AttendanceRow``s as a zstd-compressed Parquet file.
+
+    Rows are converted to columns ``PARQUET_BATCH_ROWS`` at a time and each
+    batch becomes a row group, so memory stays bounded by the batch size.
+    Dates and working hours keep their native types for downstream loads.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("date", pa.date32()),
+        ("employee_id", pa.string()),
+        ("employee_name", pa.string()),
+        ("department", pa.string()),
+        ("check_in", pa.string()),
+        ("check_out", pa.string()),
+        ("status", pa.string()),
+        ("working_hours", pa.float64()),
+        ("permissions", pa.string()),
+        ("remarks", pa.string()),
+    ])
+
+    if output is None:
+        output = tempfile.TemporaryFile()
+    writer = pq.ParquetWriter(output, schema, compression="zstd")
+
+    def flush(batch):
+        columns = {name: list(values) for name, values in zip(PARQUET_COLUMNS, zip(*batch))}
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+
+    batch = []
+    for row in rows:
+        values = row.as_export_row()
+        values[0] = row.date
+        values[7] = row.calculated_hours
+        batch.append(values)
+        if len(batch) >= PARQUET_BATCH_ROWS:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    writer.close()
+
+    output.seek(0)
+    return output
+
+
+EXPORT_WRITERS = {
+    "xlsx": write_xlsx,
+    "parquet": write_parquet,
+}
+
+
+# ----------------------------
+# Export cache
+# ----------------------------
+def export_data_version(start, end):
+    """Fingerprint of the data an export over ``start``..``end`` reads.
+
+    Attendance and Permission writes stamp their day's rollup rows, so only
+    exports covering that day change; roster edits bump ReportDataVersion,
+    and approved leave in the range covers the rows shown as On Leave.
+    """
+    days = AttendanceDailySummary.objects.filter(date__range=(start, end)).aggregate(
+        updated=Max("updated_at"), rows=Count("id")
+    )
+    leave = LeaveRequest.objects.filter(status="Approved", start_date__lte=end, end_date__gte=start).aggregate(
+        updated=Max("updated_at"), rows=Count("id")
+    )
+    return (
+        f"{days['updated']}:{days['rows']}:{ReportDataVersion.current()}:"
+        f"{leave['updated']}:{leave['rows']}"
+    )
+
+
+def export_cache_key(start, end, employee_filter="", department_filter="", file_format="xlsx"):
+    """Cache key for an export: its filters and format plus the current data version."""
+    raw = "|".join([
+        start.isoformat(), end.isoformat(), employee_filter, str(department_filter), file_format,
+        export_data_version(start, end),
+    ])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cached_export_path(cache_key, file_format="xlsx"):
+    return os.path.join(settings.EXPORT_CACHE_DIR, f"{cache_key}.{file_format}")
+
+
+def build_export(start, end, employee_filter="", department_filter="", cache_key=None, on_progress=None,
+                 file_format="xlsx", workers=1):
+    """Return the path of the cached export for these filters, generating it if needed.
+
+    The file is written to a temporary file next to the cache and moved into
+    place atomically, so concurrent builders never serve a partial file.
+    Expired files are pruned whenever a new one is added. ``workers`` > 1
+    builds long ranges on a process pool (see iter_report_rows).
+    """
+    cache_key = cache_key or export_cache_key(start, end, employee_filter, department_filter, file_format)
+    path = cached_export_path(cache_key, file_format)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(settings.EXPORT_CACHE_DIR, exist_ok=True)
+    rows = iter_report_rows(start, end, employee_filter, department_filter, workers=workers)
+    if on_progress:
+        total = ((end - start).days + 1) * max(Employee.objects.count(), 1)
+        rows = _report_progress(rows, total, on_progress)
+
+    fd, tmp_path = tempfile.mkstemp(dir=settings.EXPORT_CACHE_DIR, suffix=f".{file_format}.part")
+    try:
+        with os.fdopen(fd, "w+b") as output:
+            EXPORT_WRITERS[file_format](rows, output)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    prune_export_cache()
+    return path
+
+
+def _report_progress(rows, total, on_progress):
+    for count, row in enumerate(rows, start=1):
+        if count % PROGRESS_EVERY_ROWS == 0:
+            on_progress(min(99, count * 100 // total))
+        yield row
+
+
+def prune_export_cache(max_age_days=None):
+    """Delete cached exports older than ``EXPORT_CACHE_MAX_AGE_DAYS``."""
+    max_age_days = max_age_days or settings.EXPORT_CACHE_MAX_AGE_DAYS
+    if not os.path.isdir(settings.EXPORT_CACHE_DIR):
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for entry in os.scandir(settings.EXPORT_CACHE_DIR):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+
+# ----------------------------
+# Export jobs
+# ----------------------------
+def run_export_job(job, workers=1):
+    """Generate (or reuse) the workbook for a claimed ExportJob and record the outcome."""
+    def on_progress(percent):
+        ExportJob.objects.filter(pk=job.pk).update(progress=percent)
+
+    try:
+        path = build_export(
+            job.start_date, job.end_date, job.employee_filter, job.department_filter,
+            cache_key=job.cache_key, on_progress=on_progress, workers=workers,
+        )
+    except Exception as e:
+        ExportJob.objects.filter(pk=job.pk).update(status="Failed", error=str(e), completed_at=timezone.now())
+        return False
+
+    ExportJob.objects.filter(pk=job.pk).update(
+        status="Completed", progress=100, file_path=path, completed_at=timezone.now()
+    )
+    return True
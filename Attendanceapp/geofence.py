@@ -0,0 +1,99 @@
+import math
+import threading
+import time
+
+from django.apps import apps
+
+EARTH_RADIUS_METERS = 6371000
+METERS_PER_DEGREE = 111320
+
+# Grid cell size in degrees (about 1.1 km of latitude). Each office is filed
+# under every cell its circle's bounding box touches, so a lookup only reads
+# the one cell the device is in.
+CELL_DEGREES = 0.01
+
+# Rebuild the grid after this long so office edits made by other processes are
+# picked up; edits in this process clear it immediately
+GEOFENCE_CACHE_SECONDS = 10 * 60
+
+_index = None
+_lock = threading.Lock()
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Distance between two coordinates in meters (haversine formula)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return EARTH_RADIUS_METERS * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _cell(lat, lon):
+    return math.floor(lat / CELL_DEGREES), math.floor(lon / CELL_DEGREES)
+
+
+class _GeofenceIndex:
+    """Active offices bucketed by grid cell."""
+
+    def __init__(self, offices):
+        self.offices = offices
+        self.cells = {}
+        for office in offices:
+            lat_span = office.radius_meters / METERS_PER_DEGREE
+            # Longitude degrees shrink towards the poles; clamp to keep the box finite
+            lon_span = office.radius_meters / (METERS_PER_DEGREE * max(math.cos(math.radians(office.latitude)), 0.01))
+            low_row, low_col = _cell(office.latitude - lat_span, office.longitude - lon_span)
+            high_row, high_col = _cell(office.latitude + lat_span, office.longitude + lon_span)
+            for row in range(low_row, high_row + 1):
+                for col in range(low_col, high_col + 1):
+                    self.cells.setdefault((row, col), []).append(office)
+
+    def locate(self, lat, lon):
+        """The closest office whose radius contains the point, with its distance, else ``(None, None)``."""
+        best, best_distance = None, None
+        for office in self.cells.get(_cell(lat, lon), ()):
+            distance = haversine_distance(lat, lon, office.latitude, office.longitude)
+            if distance <= office.radius_meters and (best is None or distance < best_distance):
+                best, best_distance = office, distance
+        return best, best_distance
+
+    def nearest(self, lat, lon):
+        """The closest office and its distance, for error messages; scans every office."""
+        return min(
+            ((office, haversine_distance(lat, lon, office.latitude, office.longitude)) for office in self.offices),
+            key=lambda pair: pair[1],
+            default=(None, None),
+        )
+
+
+def _build_index():
+    Office = apps.get_model("Attendanceapp", "Office")
+    return _GeofenceIndex(list(Office.objects.filter(is_active=True)))
+
+
+def get_index():
+    global _index
+    cached = _index
+    if cached and time.monotonic() - cached[0] < GEOFENCE_CACHE_SECONDS:
+        return cached[1]
+    index = _build_index()
+    with _lock:
+        _index = (time.monotonic(), index)
+    return index
+
+
+def clear_geofence_index():
+    global _index
+    with _lock:
+        _index = None
+
+
+def locate_office(lat, lon):
+    """``(office, distance)`` for the office the device is in, or ``(None, None)``."""
+    return get_index().locate(lat, lon)
+
+
+def nearest_office(lat, lon):
+    return get_index().nearest(lat, lon)
@@ -0,0 +1,80 @@
+import hashlib
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.functions import Lower
+
+# Generated employee IDs: a letter prefix and a number (NIMD001, EMP00001)
+EMPLOYEE_ID_PATTERN = re.compile(r"^[A-Za-z]+\d+$")
+
+# identifier -> Employee (with user) mappings, kept only in a cache shared by
+# all workers (settings.SHARED_CACHE). Every User/Employee save or delete bumps
+# the version in the keys, so renames, password changes and new namesakes are
+# seen by every worker at once.
+IDENTIFIER_CACHE_SECONDS = 24 * 60 * 60
+IDENTIFIER_VERSION_KEY = "login_identifier_version"
+
+
+def classify_identifier(identifier):
+    """Return ``(kind, value)`` for a login identifier: an employee ID, an email or a name.
+
+    Only the matching column is searched, so each lookup hits one index:
+    Employee.employee_id, User.email, or the LOWER(name) index on User.
+    """
+    identifier = identifier.strip()
+    if "@" in identifier:
+        return "email", identifier
+    if EMPLOYEE_ID_PATTERN.match(identifier):
+        return "employee_id", identifier.upper()
+    return "name", identifier.lower()
+
+
+def forget_identifiers():
+    """Drop every cached identifier mapping (by moving to a new key version)."""
+    if not settings.SHARED_CACHE:
+        return
+    try:
+        cache.incr(IDENTIFIER_VERSION_KEY)
+    except ValueError:
+        cache.set(IDENTIFIER_VERSION_KEY, 1, None)
+
+
+def _lookup(kind, value):
+    employees = apps.get_model("Attendanceapp", "Employee").objects.select_related("user")
+    if kind == "employee_id":
+        return employees.filter(employee_id=value)
+    if kind == "email":
+        return employees.filter(user__email=value)
+    return employees.annotate(name_lower=Lower("user__name")).filter(name_lower=value)
+
+
+def _resolve(kind, value):
+    cache_key = None
+    if settings.SHARED_CACHE:
+        version = cache.get_or_set(IDENTIFIER_VERSION_KEY, 1, None)
+        cache_key = f"login_identifier:{version}:{kind}:{hashlib.sha1(value.encode()).hexdigest()}"
+        employee = cache.get(cache_key)
+        if employee is not None:
+            return employee
+
+    matches = list(_lookup(kind, value)[:2])
+    if len(matches) != 1:
+        return None
+    if cache_key:
+        cache.set(cache_key, matches[0], IDENTIFIER_CACHE_SECONDS)
+    return matches[0]
+
+
+def resolve_employee(identifier):
+    """The Employee (with user) an ID, email or name refers to, or None.
+
+    A name shared by several employees resolves to None. Names shaped like
+    an employee ID ("ravi2") are tried as a name when no employee has that ID.
+    """
+    kind, value = classify_identifier(identifier)
+    employee = _resolve(kind, value)
+    if employee is None and kind == "employee_id":
+        employee = _resolve("name", value.lower())
+    return employee
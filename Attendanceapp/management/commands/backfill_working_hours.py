@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from Attendanceapp.models import Attendance, AttendanceDailySummary
+from Attendanceapp.reports import EXPORT_CHUNK_DAYS, load_permissions
+
+
+class Command(BaseCommand):
+    help = "Fill Attendance.working_hours and permission_hours for existing rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only-missing", action="store_true",
+            help="Only fill completed rows whose working_hours is still 0",
+        )
+
+    def handle(self, *args, **options):
+        closed = Attendance.objects.filter(check_in__isnull=False, check_out__isnull=False)
+        if options["only_missing"]:
+            closed = closed.filter(working_hours=0)
+        bounds = closed.aggregate(first=Min("date"), last=Max("date"))
+        if bounds["first"] is None:
+            self.stdout.write("ℹ️ No completed attendance rows to backfill")
+            return
+
+        count = 0
+        chunk_start = bounds["first"]
+        while chunk_start <= bounds["last"]:
+            chunk_end = chunk_start + timedelta(days=EXPORT_CHUNK_DAYS - 1)
+            records = list(closed.filter(date__range=(chunk_start, chunk_end)))
+            permission_map = load_permissions({r.employee_id for r in records}, chunk_start, chunk_end)
+
+            for record in records:
+                permissions = permission_map.get((record.employee_id, record.date), [])
+                record.compute_hours([(p.start_time, p.end_time) for p in permissions if p.status == "Approved"])
+            Attendance.objects.bulk_update(records, ["working_hours", "permission_hours"], batch_size=500)
+            # bulk_update skips Attendance.save(); mark the days changed for the export cache
+            AttendanceDailySummary.objects.filter(date__range=(chunk_start, chunk_end)).update(updated_at=timezone.now())
+
+            count += len(records)
+            chunk_start = chunk_end + timedelta(days=1)
+        self.stdout.write(f"✅ Backfilled working hours for {count} attendance rows")
+        self.stdout.write("Run rebuild_attendance_summary to refresh the daily rollup totals.")
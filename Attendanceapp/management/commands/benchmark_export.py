@@ -0,0 +1,48 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Attendanceapp.exports import write_xlsx
+from Attendanceapp.reports import iter_report_rows
+
+
+class Command(BaseCommand):
+    help = "Time serial vs date-sharded parallel attendance report generation"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="First report date (YYYY-MM-DD), default one year ago")
+        parser.add_argument("--end", help="Last report date (YYYY-MM-DD), default today")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for the parallel run")
+        parser.add_argument("--department", default="", help="Department id filter")
+        parser.add_argument("--xlsx", action="store_true", help="Also write the workbook, not just the rows")
+
+    def run(self, start, end, department, workers, xlsx):
+        began = time.perf_counter()
+        rows = iter_report_rows(start, end, department_filter=department, workers=workers)
+        if xlsx:
+            write_xlsx(rows).close()
+            count = None
+        else:
+            count = sum(1 for _ in rows)
+        return time.perf_counter() - began, count
+
+    def handle(self, *args, **options):
+        try:
+            end = datetime.strptime(options["end"], "%Y-%m-%d").date() if options["end"] else datetime.now().date()
+            start = (
+                datetime.strptime(options["start"], "%Y-%m-%d").date()
+                if options["start"] else end - timedelta(days=364)
+            )
+        except ValueError:
+            raise CommandError("Dates must be in YYYY-MM-DD format")
+
+        serial, rows = self.run(start, end, options["department"], 1, options["xlsx"])
+        parallel, _ = self.run(start, end, options["department"], options["workers"], options["xlsx"])
+
+        if rows is not None:
+            self.stdout.write(f"Rows: {rows}")
+        self.stdout.write(f"Serial:   {serial:.2f}s")
+        self.stdout.write(f"Parallel: {parallel:.2f}s ({options['workers']} workers)")
+        self.stdout.write(f"✅ Speedup: {serial / parallel:.2f}x")
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Attendanceapp.models import Attendance, AttendanceDailySummary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the AttendanceDailySummary rollup from existing Attendance rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="First date to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--end", help="Last date to rebuild (YYYY-MM-DD)")
+        parser.add_argument(
+            "--only-missing", action="store_true",
+            help="Only build (date, department) buckets that have no summary row yet",
+        )
+
+    def handle(self, *args, **options):
+        buckets = Attendance.objects.all()
+        try:
+            if options["start"]:
+                buckets = buckets.filter(date__gte=datetime.strptime(options["start"], "%Y-%m-%d").date())
+            if options["end"]:
+                buckets = buckets.filter(date__lte=datetime.strptime(options["end"], "%Y-%m-%d").date())
+        except ValueError:
+            raise CommandError("Dates must be in YYYY-MM-DD format")
+
+        buckets = buckets.values_list("date", "employee__department_id").distinct().order_by("date")
+        if options["only_missing"]:
+            stored = set(AttendanceDailySummary.objects.values_list("date", "department_id"))
+            buckets = [bucket for bucket in buckets if bucket not in stored]
+
+        count = 0
+        for day, department_id in buckets:
+            AttendanceDailySummary.refresh(day, department_id)
+            count += 1
+
+        self.stdout.write(f"✅ Rebuilt {count} daily summary rows")
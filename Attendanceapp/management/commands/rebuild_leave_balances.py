@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from Attendanceapp.models import LeaveBalance, LeaveRequest
+
+
+class Command(BaseCommand):
+    help = "Rebuild the LeaveBalance ledger from existing LeaveRequest rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, help="Only rebuild this year")
+        parser.add_argument(
+            "--if-empty", action="store_true",
+            help="Only build the ledger when it has no rows yet (first deploy)",
+        )
+
+    def handle(self, *args, **options):
+        if options["if_empty"] and (
+            LeaveBalance.objects.exists() or not LeaveRequest.objects.filter(status__in=["Pending", "Approved"]).exists()
+        ):
+            self.stdout.write("ℹ️ Leave balance ledger already populated")
+            return
+        count = LeaveBalance.rebuild(options["year"])
+        self.stdout.write(f"✅ Rebuilt {count} leave balance rows")
@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from Attendanceapp.exports import prune_export_cache, run_export_job
+from Attendanceapp.models import ExportJob
+
+
+def _run(job, report_workers):
+    try:
+        return run_export_job(job, workers=report_workers)
+    finally:
+        # Each pool thread holds its own DB connection
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Process pending attendance export jobs on a local thread pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.EXPORT_WORKERS, help="Jobs run in parallel")
+        parser.add_argument(
+            "--report-workers", type=int, default=settings.REPORT_WORKERS,
+            help="Processes used to build each long report",
+        )
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between queue polls")
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit")
+
+    def claim_jobs(self, limit):
+        """Move up to ``limit`` Pending jobs to Running; the conditional update makes claims exclusive."""
+        claimed = []
+        for job in ExportJob.objects.filter(status="Pending").order_by("created_at")[:limit]:
+            if ExportJob.objects.filter(pk=job.pk, status="Pending").update(status="Running"):
+                job.status = "Running"
+                claimed.append(job)
+        return claimed
+
+    def handle(self, *args, **options):
+        workers = max(options["workers"], 1)
+        self.stdout.write(f"✅ Export worker started with {workers} workers")
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            running = set()
+            last_prune = None
+            while True:
+                running = {future for future in running if not future.done()}
+                for job in self.claim_jobs(workers - len(running)):
+                    self.stdout.write(f"Running export job {job.pk}")
+                    running.add(pool.submit(_run, job, options["report_workers"]))
+
+                if options["once"] and not running and not ExportJob.objects.filter(status="Pending").exists():
+                    break
+
+                if last_prune is None or time.monotonic() - last_prune > 3600:
+                    prune_export_cache()
+                    last_prune = time.monotonic()
+                close_old_connections()
+                time.sleep(options["poll_interval"])
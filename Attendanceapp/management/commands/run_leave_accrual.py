@@ -0,0 +1,24 @@
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Attendanceapp.models import LeaveAccrualSnapshot
+
+
+class Command(BaseCommand):
+    help = "Write monthly leave accrual snapshots, carrying leave forward in January"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--period", help="Month to accrue (YYYY-MM), default the current month")
+
+    def handle(self, *args, **options):
+        try:
+            period = (
+                datetime.strptime(options["period"], "%Y-%m").date()
+                if options["period"] else date.today().replace(day=1)
+            )
+        except ValueError:
+            raise CommandError("Period must be in YYYY-MM format")
+
+        count = LeaveAccrualSnapshot.accrue(period)
+        self.stdout.write(f"✅ Wrote {count} accrual snapshots for {period:%Y-%m}")
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Attendanceapp', '0024_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='permission_hours',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='working_hours',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:17
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+# PostgreSQL only: reject overlapping Pending/Approved leaves for the same
+# employee in the database itself, even for writes that bypass clean().
+# Skipped when settings.LEAVE_OVERLAP_CONSTRAINT is off or existing leaves
+# already overlap; the SQL can be run by hand once they are resolved.
+EXCLUSION_SQL = """
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE "Attendanceapp_leaverequest" ADD CONSTRAINT "leave_no_overlap"
+    EXCLUDE USING gist (employee_id WITH =, daterange(start_date, end_date, '[]') WITH &&)
+    WHERE (status IN ('Pending', 'Approved'));
+"""
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    if not settings.LEAVE_OVERLAP_CONSTRAINT:
+        print("\n  ℹ️ leave_no_overlap not added: LEAVE_OVERLAP_CONSTRAINT is off")
+        return
+
+    LeaveRequest = apps.get_model("Attendanceapp", "LeaveRequest")
+    active = LeaveRequest.objects.using(schema_editor.connection.alias).filter(status__in=["Pending", "Approved"])
+    overlapping = active.filter(Exists(
+        active.filter(
+            employee_id=OuterRef("employee_id"),
+            start_date__lte=OuterRef("end_date"),
+            end_date__gte=OuterRef("start_date"),
+        ).exclude(pk=OuterRef("pk"))
+    ))
+    ids = list(overlapping.order_by("pk").values_list("pk", flat=True)[:20])
+    if ids:
+        print(
+            f"\n  ℹ️ leave_no_overlap not added: Pending/Approved leave requests overlap "
+            f"(ids {', '.join(map(str, ids))}). Resolve them and run EXCLUSION_SQL from this migration."
+        )
+        return
+    schema_editor.execute(EXCLUSION_SQL)
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute('ALTER TABLE "Attendanceapp_leaverequest" DROP CONSTRAINT IF EXISTS "leave_no_overlap";')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Attendanceapp', '0026_leavebalance'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['employee', 'start_date', 'end_date'], name='leave_employee_interval_idx'),
+        ),
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
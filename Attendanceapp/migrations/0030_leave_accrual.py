@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Attendanceapp', '0029_holiday'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leavetype',
+            name='carry_forward_cap',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='leavetype',
+            name='monthly_accrual',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+        migrations.CreateModel(
+            name='LeaveAccrualSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the month')),
+                ('carried_forward', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('accrued', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('entitlement', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Attendanceapp.employee')),
+                ('leave_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Attendanceapp.leavetype')),
+            ],
+            options={
+                'unique_together': {('employee', 'leave_type', 'period')},
+            },
+        ),
+    ]
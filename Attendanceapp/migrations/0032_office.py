@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:31
+
+from django.db import migrations, models
+
+
+def create_main_office(apps, schema_editor):
+    # The site that was previously hard-coded in views.check_in/check_out
+    Office = apps.get_model("Attendanceapp", "Office")
+    Office.objects.get_or_create(
+        name="Main Office",
+        defaults={"latitude": 8.1631162, "longitude": 77.4108498, "radius_meters": 200},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Attendanceapp', '0031_user_name_lower_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Office',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('radius_meters', models.PositiveIntegerField(default=200)),
+                ('timezone', models.CharField(default='Asia/Kolkata', max_length=64)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.RunPython(create_main_office, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:56
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Attendanceapp', '0034_leaverequest_employee_created_index'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='attendancedailysummary',
+            name='absent_count',
+        ),
+        migrations.RemoveField(
+            model_name='attendancedailysummary',
+            name='headcount',
+        ),
+    ]
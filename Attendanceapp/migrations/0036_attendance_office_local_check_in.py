@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import TruncTime
+
+
+def backfill_local_check_in(apps, schema_editor):
+    # Existing check-ins were all classified in IST, the stored wall-clock time
+    Attendance = apps.get_model("Attendanceapp", "Attendance")
+    Attendance.objects.filter(check_in__isnull=False).update(local_check_in=TruncTime("check_in"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Attendanceapp', '0035_remove_summary_headcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='local_check_in',
+            field=models.TimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='office',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='Attendanceapp.office'),
+        ),
+        migrations.RunPython(backfill_local_check_in, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,21 @@
 
 import datetime
+from collections import defaultdict
+from decimal import Decimal
+
 import pytz
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.db.models.functions import Lower
 from django.utils import timezone
 
+from .authentication import forget_all, forget_user
+from .geofence import clear_geofence_index
+from .identifiers import forget_identifiers
+from .workdays import clear_workday_cache, working_days
+
 
 # ----------------------------
 # Custom User Manager
@@ -42,9 +52,38 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["name"]
 
+    class Meta:
+        indexes = [
+            # Login by name is case-insensitive (see identifiers.resolve_employee)
+            models.Index(Lower("name"), name="user_name_lower_idx"),
+        ]
+
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.pk:
+            transaction.on_commit(lambda: forget_user(self.pk))
+        # Logins only stamp last_login, which no report or login lookup reads
+        if set(kwargs.get("update_fields") or ()) != {"last_login"}:
+            transaction.on_commit(forget_identifiers)
+            roster_changed()
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        with transaction.atomic():
+            # The cascade removes the employee and their days without Employee.delete()
+            employee = Employee.objects.filter(user_id=user_id).values("department_id").first()
+            days = list(Attendance.objects.filter(employee__user_id=user_id).values_list("date", flat=True))
+            result = super().delete(*args, **kwargs)
+            if employee:
+                AttendanceDailySummary.refresh_days(days, {employee["department_id"]})
+        transaction.on_commit(lambda: forget_user(user_id))
+        transaction.on_commit(forget_identifiers)
+        roster_changed()
+        return result
+
 
 # ----------------------------
 # Department Model
@@ -55,6 +94,56 @@ class Department(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Cached API logins carry their employee's department
+        transaction.on_commit(forget_all)
+        roster_changed()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(forget_all)
+        roster_changed()
+        return result
+
+
+# ----------------------------
+# Office Model
+# ----------------------------
+class Office(models.Model):
+    """A site employees can check in at: anywhere within ``radius_meters`` of its coordinates."""
+
+    name = models.CharField(max_length=100, unique=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    radius_meters = models.PositiveIntegerField(default=200)
+    timezone = models.CharField(max_length=64, default="Asia/Kolkata")
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def tzinfo(self):
+        return pytz.timezone(self.timezone)
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        if self.timezone not in pytz.all_timezones_set:
+            raise ValidationError({"timezone": f"Unknown timezone: {self.timezone}"})
+        if not (-90 <= self.latitude <= 90 and -180 <= self.longitude <= 180):
+            raise ValidationError("Latitude must be within ±90 and longitude within ±180")
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        transaction.on_commit(clear_geofence_index)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(clear_geofence_index)
+        return result
+
 
 # ----------------------------
 # Employee Model
@@ -71,7 +160,29 @@ class Employee(models.Model):
             last_employee = Employee.objects.order_by("-id").first()
             next_id = (last_employee.id + 1) if last_employee else 1
             self.employee_id = f"EMP{next_id:05d}"
-        super().save(*args, **kwargs)
+        previous = Employee.objects.filter(pk=self.pk).values("department_id").first() if self.pk else None
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if previous and previous["department_id"] != self.department_id:
+                # Past days move to the new department's rollup
+                AttendanceDailySummary.refresh_days(
+                    Attendance.objects.filter(employee=self).values_list("date", flat=True),
+                    {previous["department_id"], self.department_id},
+                )
+        transaction.on_commit(lambda: forget_user(self.user_id))
+        transaction.on_commit(forget_identifiers)
+        roster_changed()
+
+    def delete(self, *args, **kwargs):
+        user_id = self.user_id
+        with transaction.atomic():
+            days = list(Attendance.objects.filter(employee_id=self.pk).values_list("date", flat=True))
+            result = super().delete(*args, **kwargs)
+            AttendanceDailySummary.refresh_days(days, {self.department_id})
+        transaction.on_commit(lambda: forget_user(user_id))
+        transaction.on_commit(forget_identifiers)
+        roster_changed()
+        return result
 
     def __str__(self):
         return f"{self.employee_id} - {self.user.name}"
@@ -84,6 +195,97 @@ def default_date():
     return timezone.now().date()
 
 
+# ----------------------------
+# Working hours helpers
+# ----------------------------
+def parse_time_value(value):
+    """Return a datetime.time for TimeField values that may still be raw strings."""
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.strptime(value, "%H:%M:%S").time()
+        except ValueError:
+            return datetime.datetime.strptime(value, "%H:%M").time()
+    return value
+
+
+# Dashboard/report classification cut-offs (office local time)
+CUTOFF_TIME = datetime.time(10, 15)
+ABSENT_TIME = datetime.time(12, 0)
+IST = pytz.timezone("Asia/Kolkata")
+
+
+def day_status_expression():
+    """Present/Late/Absent classification of an Attendance row as a SQL expression.
+
+    The dashboard, exports and daily rollup annotate querysets with this
+    instead of converting each check-in to its office's timezone in Python;
+    the converted time is stored in ``local_check_in`` at check-in.
+    """
+    return models.Case(
+        models.When(check_in__isnull=True, then=models.Value("Absent")),
+        models.When(local_check_in__gt=ABSENT_TIME, then=models.Value("Absent")),
+        models.When(local_check_in__gt=CUTOFF_TIME, then=models.Value("Late")),
+        default=models.Value("Present"),
+        output_field=models.CharField(max_length=10),
+    )
+
+
+def attendance_totals(attendance_qs):
+    """Present/late counts and working hours for an Attendance queryset.
+
+    One conditional-aggregate query over the status annotation and the stored
+    ``working_hours`` column. Returns ``(present, late, hours)``.
+    """
+    totals = attendance_qs.annotate(day_status=day_status_expression()).aggregate(
+        present=models.Count("id", filter=models.Q(day_status="Present")),
+        late=models.Count("id", filter=models.Q(day_status="Late")),
+        hours=models.Sum("working_hours"),
+    )
+    return totals["present"], totals["late"], round(totals["hours"] or 0, 2)
+
+
+# Check-ins after this (office local time) are stored as Late
+LATE_AFTER = datetime.time(10, 0)
+NO_CHECK_IN_REMARK = "No check-in recorded"
+
+
+def check_in_status(check_in, tz=IST):
+    """``(status, default remarks, local time)`` an Attendance row gets for a check-in (or None).
+
+    ``tz`` is the timezone of the office checked in at.
+    """
+    if not check_in:
+        return "Absent", NO_CHECK_IN_REMARK, None
+    local = check_in.astimezone(tz)
+    if local.time() > LATE_AFTER:
+        return "Late", f"Checked in at {local.strftime('%H:%M %Z')} (Late)", local.time()
+    return "Present", f"Checked in at {local.strftime('%H:%M %Z')} (On time)", local.time()
+
+
+def calculate_working_hours(day, check_in, check_out, permissions):
+    """Hours between check-in and check-out minus approved permission windows.
+
+    ``permissions`` is an iterable of ``(start_time, end_time)`` pairs that
+    have already been filtered to approved permissions for ``day``.
+    """
+    if not (check_in and check_out):
+        return 0
+
+    total_time = check_out - check_in
+    for p_start, p_end in permissions:
+        start = datetime.datetime.combine(day, parse_time_value(p_start))
+        end = datetime.datetime.combine(day, parse_time_value(p_end))
+
+        # Make start/end timezone aware if check_in/check_out are aware
+        if timezone.is_aware(check_in):
+            start = timezone.make_aware(start)
+            end = timezone.make_aware(end)
+
+        total_time -= (end - start)
+
+    return round(total_time.total_seconds() / 3600, 2)
+
+
 # ----------------------------
 # Permission Model
 # ----------------------------
@@ -104,26 +306,27 @@ class Permission(models.Model):
     def __str__(self):
         return f"{self.employee.user.name} - {self.date} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        """Recompute the day's stored hours once a permission can affect them."""
+        with transaction.atomic():
+            is_new = self.pk is None
+            super().save(*args, **kwargs)
+            if not (is_new and self.status == "Pending"):
+                Attendance.refresh_hours(self.employee_id, self.date)
+            AttendanceDailySummary.touch(self.date)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Attendance.refresh_hours(self.employee_id, self.date)
+            AttendanceDailySummary.touch(self.date)
+        return result
+
     @property
     def duration_hours(self):
         """Safe duration calculation (handles both str and datetime.time)."""
-        start_time = self.start_time
-        end_time = self.end_time
-
-        if isinstance(start_time, str):
-            try:
-                start_time = datetime.datetime.strptime(start_time, "%H:%M:%S").time()
-            except ValueError:
-                start_time = datetime.datetime.strptime(start_time, "%H:%M").time()
-        
-        if isinstance(end_time, str):
-            try:
-                end_time = datetime.datetime.strptime(end_time, "%H:%M:%S").time()
-            except ValueError:
-                end_time = datetime.datetime.strptime(end_time, "%H:%M").time()
-
-        start = datetime.datetime.combine(self.date, start_time)
-        end = datetime.datetime.combine(self.date, end_time)
+        start = datetime.datetime.combine(self.date, parse_time_value(self.start_time))
+        end = datetime.datetime.combine(self.date, parse_time_value(self.end_time))
 
         return round((end - start).total_seconds() / 3600, 2)
 
@@ -131,6 +334,11 @@ class Permission(models.Model):
 # ----------------------------
 # Attendance Model
 # ----------------------------
+# With a cache shared by all workers (settings.SHARED_CACHE), today_attendance
+# responses are served from it and check-in/out write through
+TODAY_CACHE_SECONDS = 5 * 60
+
+
 class Attendance(models.Model):
     STATUS_CHOICES = [
         ("Present", "Present"),
@@ -143,75 +351,326 @@ class Attendance(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="Absent")
     check_in = models.DateTimeField(null=True, blank=True)
     check_out = models.DateTimeField(null=True, blank=True)
+    # Where the employee checked in (None: added by an admin, treated as IST)
+    office = models.ForeignKey(Office, null=True, blank=True, on_delete=models.SET_NULL)
+    # check_in in the office's timezone, which late/absent classification uses
+    local_check_in = models.TimeField(null=True, blank=True, editable=False)
     remarks = models.TextField(null=True, blank=True)
+    # Denormalized at check-out and whenever the day's permissions change
+    working_hours = models.FloatField(default=0)
+    permission_hours = models.FloatField(default=0)
 
     class Meta:
         unique_together = ("employee", "date")
 
     def save(self, *args, **kwargs):
         """Auto-assign status and remarks based on check-in time."""
-        IST = pytz.timezone("Asia/Kolkata")
-
-        if self.check_in:
-            check_in_ist = self.check_in.astimezone(IST)
-            check_in_time = check_in_ist.time()
-
-            if check_in_time > datetime.time(10, 0):
-                self.status = "Late"
-                if not self.remarks:
-                    self.remarks = f"Checked in at {check_in_time.strftime('%H:%M')} IST (Late)"
-            else:
-                self.status = "Present"
-                if not self.remarks:
-                    self.remarks = f"Checked in at {check_in_time.strftime('%H:%M')} IST (On time)"
-        else:
-            self.status = "Absent"
-            if not self.remarks:
-                self.remarks = "No check-in recorded"
+        self.status, remarks, self.local_check_in = check_in_status(self.check_in, self.tzinfo)
+        if not self.remarks:
+            self.remarks = remarks
 
-        super().save(*args, **kwargs)
+        self.compute_hours()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {"working_hours", "permission_hours", "local_check_in"}
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            AttendanceDailySummary.refresh(self.date, self.employee.department_id)
+            self.write_today_through(self.employee_id, self.date, None)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            AttendanceDailySummary.refresh(self.date, self.employee.department_id)
+            self.write_today_through(self.employee_id, self.date, None)
+        return result
 
     @property
-    def working_hours(self):
-        """Calculate working hours after subtracting approved permissions."""
-        if self.check_in and self.check_out:
-            total_time = self.check_out - self.check_in
+    def tzinfo(self):
+        return self.office.tzinfo if self.office_id else IST
+
+    def compute_hours(self, permissions=None):
+        """Set ``working_hours`` and ``permission_hours`` for a completed day.
 
-            # Subtract approved permission hours (if any)
+        ``permissions`` are the day's approved ``(start_time, end_time)``
+        pairs; they are queried when not supplied. Open days store zero.
+        """
+        if not (self.check_in and self.check_out):
+            self.working_hours = 0
+            self.permission_hours = 0
+            return
+
+        if permissions is None:
             permissions = Permission.objects.filter(
-                employee=self.employee,
+                employee_id=self.employee_id,
                 date=self.date,
                 status="Approved",
+            ).values_list("start_time", "end_time")
+        permissions = list(permissions)
+
+        self.working_hours = calculate_working_hours(self.date, self.check_in, self.check_out, permissions)
+        self.permission_hours = round(sum(
+            (datetime.datetime.combine(self.date, parse_time_value(end))
+             - datetime.datetime.combine(self.date, parse_time_value(start))).total_seconds()
+            for start, end in permissions
+        ) / 3600, 2)
+
+    @classmethod
+    def record_check_in(cls, employee, day, check_in, office=None):
+        """Check the employee in for ``day`` at ``office``; returns the stored status, or None if already checked in.
+
+        The write is one INSERT or, if the day's row already exists (e.g.
+        added by an admin), a conditional UPDATE ... WHERE check_in IS NULL;
+        the (employee, date) unique constraint makes a concurrent INSERT
+        fail, in which case the UPDATE is retried. Either way only one of
+        several simultaneous check-ins can succeed.
+        """
+        status, remarks, local_check_in = check_in_status(check_in, office.tzinfo if office else IST)
+        not_checked_in = cls.objects.filter(employee=employee, date=day, check_in__isnull=True)
+        values = {
+            "check_in": check_in,
+            "office": office,
+            "local_check_in": local_check_in,
+            "status": status,
+            # Replace the placeholder remark of a row saved before check-in
+            "remarks": models.Case(
+                models.When(
+                    models.Q(remarks__isnull=True) | models.Q(remarks__in=["", NO_CHECK_IN_REMARK]),
+                    then=models.Value(remarks),
+                ),
+                default=models.F("remarks"),
+                output_field=models.TextField(),
+            ),
+        }
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    cls.objects.bulk_create([
+                        cls(
+                            employee=employee, date=day, check_in=check_in, office=office,
+                            local_check_in=local_check_in, status=status, remarks=remarks,
+                        )
+                    ])
+            except IntegrityError:
+                # Today's row already exists; it is ours only if still not checked in
+                if not not_checked_in.update(**values):
+                    return None
+            AttendanceDailySummary.refresh(day, employee.department_id)
+            payload = cls(employee=employee, date=day, check_in=check_in, status=status).today_payload()
+            cls.write_today_through(employee.pk, day, payload)
+        return status
+
+    @classmethod
+    def record_check_out(cls, employee, day, check_out):
+        """Check the employee out for ``day``; returns ``(attendance, error message)``.
+
+        The check-out itself is one conditional UPDATE ... WHERE check_out IS
+        NULL, so a repeated tap cannot overwrite the first one; the stored
+        hours and rollup are then refreshed through save().
+        """
+        with transaction.atomic():
+            updated = cls.objects.filter(
+                employee=employee, date=day, check_in__isnull=False, check_out__isnull=True
+            ).update(check_out=check_out)
+            attendance = cls.objects.select_related("employee", "office").filter(employee=employee, date=day).first()
+            if not updated:
+                if attendance is None or not attendance.check_in:
+                    return None, "No check-in record found"
+                return None, "Already checked out"
+            attendance.save(update_fields=["working_hours", "permission_hours"])
+            payload = attendance.today_payload()
+            cls.write_today_through(employee.pk, day, payload)
+        return attendance, None
+
+    @staticmethod
+    def today_cache_key(employee_id, day):
+        return f"attendance_today:{employee_id}:{day.isoformat()}"
+
+    @classmethod
+    def write_today_through(cls, employee_id, day, payload):
+        """Store ``payload`` (None drops it) as the cached today_attendance once committed.
+
+        A no-op with a per-process cache: other workers would keep serving
+        what they cached before, so today_attendance does not cache then.
+        """
+        if not settings.SHARED_CACHE:
+            return
+        key = cls.today_cache_key(employee_id, day)
+        if payload is None:
+            transaction.on_commit(lambda: cache.delete(key))
+        else:
+            transaction.on_commit(lambda: cache.set(key, payload, TODAY_CACHE_SECONDS))
+
+    def today_payload(self):
+        """The ``attendance`` part of the today_attendance response."""
+        return {
+            "date": str(self.date),
+            "check_in": self.check_in.astimezone(IST).strftime("%H:%M") if self.check_in else None,
+            "check_out": self.check_out.astimezone(IST).strftime("%H:%M") if self.check_out else None,
+            "status": self.status,
+        }
+
+    @classmethod
+    def refresh_hours(cls, employee_id, day):
+        """Recompute the stored hours of one employee's day after a Permission change."""
+        attendance = cls.objects.select_related("employee", "office").filter(employee_id=employee_id, date=day).first()
+        if attendance and attendance.check_in and attendance.check_out:
+            attendance.save(update_fields=["working_hours", "permission_hours"])
+
+
+# ----------------------------
+# Daily Attendance Rollup
+# ----------------------------
+class AttendanceDailySummary(models.Model):
+    """Per (date, department) attendance counts kept in step with Attendance writes."""
+
+    date = models.DateField()
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True)
+    present_count = models.PositiveIntegerField(default=0)
+    late_count = models.PositiveIntegerField(default=0)
+    total_working_hours = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("date", "department")
+
+    def __str__(self):
+        return f"{self.date} - {self.department or 'No department'}"
+
+    @classmethod
+    def refresh(cls, day, department_id):
+        """Recompute the rollup row for one (date, department) bucket.
+
+        The bucket row is locked first so concurrent check-ins for the same
+        department serialize instead of overwriting each other's counts.
+        """
+        with transaction.atomic():
+            summary, _ = cls.objects.select_for_update().get_or_create(date=day, department_id=department_id)
+
+            present, late, total_hours = attendance_totals(
+                Attendance.objects.filter(date=day, employee__department_id=department_id)
             )
-            for p in permissions:
-                # Handle string time format gracefully
-                p_start = p.start_time
-                p_end = p.end_time
-                
-                if isinstance(p_start, str):
-                    try:
-                        p_start = datetime.datetime.strptime(p_start, "%H:%M:%S").time()
-                    except ValueError:
-                        p_start = datetime.datetime.strptime(p_start, "%H:%M").time()
-                        
-                if isinstance(p_end, str):
-                    try:
-                        p_end = datetime.datetime.strptime(p_end, "%H:%M:%S").time()
-                    except ValueError:
-                        p_end = datetime.datetime.strptime(p_end, "%H:%M").time()
-
-                start = datetime.datetime.combine(self.date, p_start)
-                end = datetime.datetime.combine(self.date, p_end)
-
-                # Make start/end timezone aware if check_in/check_out are aware
-                if timezone.is_aware(self.check_in):
-                    start = timezone.make_aware(start)
-                    end = timezone.make_aware(end)
-
-                total_time -= (end - start)
-
-            return round(total_time.total_seconds() / 3600, 2)
-        return 0
+
+            summary.present_count = present
+            summary.late_count = late
+            summary.total_working_hours = total_hours
+            summary.save()
+        return summary
+
+    @classmethod
+    def touch(cls, day):
+        """Mark ``day``'s rows as changed (for the export cache) without recomputing them."""
+        cls.objects.filter(date=day).update(updated_at=timezone.now())
+
+    @classmethod
+    def refresh_days(cls, days, department_ids):
+        """Recompute the buckets of ``department_ids`` on ``days``.
+
+        Used when an employee moves department or is deleted, which only
+        changes the days they have attendance on. Existing buckets are
+        locked and recomputed from one grouped aggregate; the few missing
+        ones go through refresh().
+        """
+        days = sorted(set(days))
+        if not days:
+            return
+
+        def in_departments(field):
+            condition = models.Q(**{f"{field}__in": [pk for pk in department_ids if pk is not None]})
+            if None in department_ids:
+                condition |= models.Q(**{f"{field}__isnull": True})
+            return condition
+
+        with transaction.atomic():
+            summaries = {
+                (summary.date, summary.department_id): summary
+                for summary in cls.objects.select_for_update().filter(in_departments("department_id"), date__in=days)
+            }
+            attendance = Attendance.objects.filter(in_departments("employee__department_id"), date__in=days)
+            totals = {
+                (row["date"], row["employee__department_id"]): row
+                for row in attendance.annotate(day_status=day_status_expression())
+                .values("date", "employee__department_id")
+                .annotate(
+                    present=models.Count("id", filter=models.Q(day_status="Present")),
+                    late=models.Count("id", filter=models.Q(day_status="Late")),
+                    hours=models.Sum("working_hours"),
+                )
+                .order_by()
+            }
+
+            now = timezone.now()
+            for key, summary in summaries.items():
+                row = totals.get(key, {})
+                summary.present_count = row.get("present", 0)
+                summary.late_count = row.get("late", 0)
+                summary.total_working_hours = round(row.get("hours") or 0, 2)
+                summary.updated_at = now
+            cls.objects.bulk_update(
+                summaries.values(), ["present_count", "late_count", "total_working_hours", "updated_at"], batch_size=500
+            )
+            for day, department_id in totals.keys() - summaries.keys():
+                cls.refresh(day, department_id)
+
+
+# ----------------------------
+# Export Jobs
+# ----------------------------
+class ExportJob(models.Model):
+    """An attendance export generated outside the request by run_export_worker."""
+
+    STATUS_CHOICES = [
+        ("Pending", "Pending"),
+        ("Running", "Running"),
+        ("Completed", "Completed"),
+        ("Failed", "Failed"),
+    ]
+
+    requested_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="export_jobs")
+    start_date = models.DateField()
+    end_date = models.DateField()
+    employee_filter = models.CharField(max_length=100, blank=True)
+    department_filter = models.CharField(max_length=20, blank=True)
+    cache_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="Pending", db_index=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    file_path = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Export {self.start_date} to {self.end_date} ({self.status})"
+
+    @property
+    def filename(self):
+        return f"attendance_report_{self.start_date.strftime('%Y%m%d')}_to_{self.end_date.strftime('%Y%m%d')}.xlsx"
+
+
+class ReportDataVersion(models.Model):
+    """Single-row counter bumped after every roster change (Employee, User, Department).
+
+    Roster edits alter every report, whatever its dates; day-level changes
+    are tracked by AttendanceDailySummary.updated_at instead. Together they
+    key the export cache (see exports.export_data_version).
+    """
+
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        if not cls.objects.filter(pk=1).update(version=models.F("version") + 1):
+            cls.objects.get_or_create(pk=1, defaults={"version": 1})
+
+
+def roster_changed():
+    """Bump the roster version once the current transaction commits."""
+    transaction.on_commit(ReportDataVersion.bump)
 
 
 # ----------------------------
@@ -224,11 +683,54 @@ class LeaveType(models.Model):
     requires_approval = models.BooleanField(default=True)
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
+    # Days earned per month (0 = the full max_days_per_year is available from January)
+    monthly_accrual = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    # Unused days carried into the next year, at most this many
+    carry_forward_cap = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.name} ({self.max_days_per_year} days/year)"
 
+    @property
+    def uses_snapshots(self):
+        """Whether entitlement comes from LeaveAccrualSnapshot rather than the flat quota."""
+        return self.monthly_accrual > 0 or self.carry_forward_cap > 0
+
+    def allowance(self, employee_id, day):
+        """Days the employee is entitled to in ``day``'s year as of ``day``.
+
+        One snapshot row read for accruing/carry-forward types; used and
+        pending days come separately from LeaveBalance.
+        """
+        if not self.uses_snapshots:
+            return self.max_days_per_year
+        snapshot = LeaveAccrualSnapshot.latest(employee_id, self.pk, day).values(*self.SNAPSHOT_FIELDS).first()
+        return self.projected_entitlement(self.max_days_per_year, self.monthly_accrual, day, snapshot)
+
+    SNAPSHOT_FIELDS = ("period", "carried_forward", "accrued")
+
+    @staticmethod
+    def projected_entitlement(max_days_per_year, monthly_accrual, day, snapshot=None):
+        """Entitlement as of ``day``: the latest snapshot with accrual projected to ``day``'s month.
+
+        ``snapshot`` holds SNAPSHOT_FIELDS of the newest snapshot at or before
+        ``day``. Accrual continues from it at ``monthly_accrual`` per month up
+        to the quota, as run_leave_accrual would write it, so the answer does
+        not depend on how far the runs have got. Before the year's first run
+        accrual is counted from January, without carry-forward, which needs
+        the previous year's closing balance.
+        """
+        quota = Decimal(max_days_per_year)
+        if snapshot is None:
+            carried, accrued, months = 0, 0, day.month
+        else:
+            carried, accrued = snapshot["carried_forward"], snapshot["accrued"]
+            months = day.month - snapshot["period"].month
+        if not monthly_accrual:
+            return carried + quota
+        return carried + min(accrued + monthly_accrual * months, quota)
+
 
 class LeaveRequest(models.Model):
     STATUS_CHOICES = [
@@ -251,13 +753,61 @@ class LeaveRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["employee", "start_date", "end_date"], name="leave_employee_interval_idx"),
+            models.Index(fields=["status", "created_at"], name="leave_status_created_idx"),
+            # my_leave_requests pages (see pagination.LeaveRequestCursorPagination)
+            models.Index(fields=["employee", "created_at"], name="leave_employee_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.employee.user.name} - {self.leave_type.name} ({self.status})"
 
+    # Fields written when a manager approves or rejects a request
+    DECISION_FIELDS = ["status", "approved_by", "approved_at", "rejection_reason", "updated_at"]
+
+    # decide_many's error for an unknown id
+    NOT_FOUND = "Leave request not found."
+
+    def balance_contribution(self):
+        """This request's share of the LeaveBalance ledger as ``(key, used, pending)``.
+
+        ``key`` is ``(employee_id, leave_type_id, year)``; rejected requests
+        contribute nothing.
+        """
+        key = (self.employee_id, self.leave_type_id, self.start_date.year)
+        if self.status == "Approved":
+            return key, self.total_days, 0
+        if self.status == "Pending":
+            return key, 0, self.total_days
+        return None
+
+    def _lock_stored_balance(self):
+        """Lock this request's row and return the ledger share it currently holds.
+
+        The share is read from the stored row, not from when this instance
+        was loaded, so a decision made meanwhile by another request is not
+        applied to the ledger twice.
+        """
+        stored = LeaveRequest.objects.select_for_update().filter(pk=self.pk).first()
+        return stored.balance_contribution() if stored else None
+
+    def _sync_balance(self, old_contribution, new_contribution):
+        """Move the ledger from ``old_contribution`` to ``new_contribution``."""
+        if old_contribution == new_contribution:
+            return
+        if old_contribution:
+            key, used, pending = old_contribution
+            LeaveBalance.adjust(*key, used=-used, pending=-pending)
+        if new_contribution:
+            key, used, pending = new_contribution
+            LeaveBalance.adjust(*key, used=used, pending=pending)
+
     @property
     def total_days(self):
-        """Calculate total number of leave days."""
-        return (self.end_date - self.start_date).days + 1
+        """Number of working days (no weekends or holidays) the leave covers."""
+        return working_days(self.start_date, self.end_date)
 
     def clean(self):
         """Validate leave request."""
@@ -267,18 +817,292 @@ class LeaveRequest(models.Model):
             if self.end_date < self.start_date:
                 raise ValidationError("End date must be after start date")
             
-            # Check for overlapping leaves
-            overlapping = LeaveRequest.objects.filter(
-                employee=self.employee,
-                status__in=['Pending', 'Approved']
-            ).exclude(pk=self.pk)
+            # Check for overlapping leaves with one range predicate on the
+            # (employee, start_date, end_date) index
+            overlap = LeaveRequest.objects.filter(
+                employee_id=self.employee_id,
+                status__in=['Pending', 'Approved'],
+                start_date__lte=self.end_date,
+                end_date__gte=self.start_date
+            ).exclude(pk=self.pk).values_list('start_date', 'end_date').first()
             
-            for leave in overlapping:
-                if not (self.end_date < leave.start_date or self.start_date > leave.end_date):
-                    raise ValidationError(
-                        f"Leave request overlaps with existing leave from {leave.start_date} to {leave.end_date}"
+            if overlap:
+                raise ValidationError(
+                    f"Leave request overlaps with existing leave from {overlap[0]} to {overlap[1]}"
+                )
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        # Approve/reject only write DECISION_FIELDS; the interval was validated on creation
+        if update_fields is None or not set(update_fields).issubset(self.DECISION_FIELDS):
+            self.full_clean()
+        with transaction.atomic():
+            stored = None if self._state.adding else self._lock_stored_balance()
+            super().save(*args, **kwargs)
+            self._sync_balance(stored, self.balance_contribution())
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            stored = self._lock_stored_balance()
+            result = super().delete(*args, **kwargs)
+            self._sync_balance(stored, None)
+        return result
+
+    @classmethod
+    def decide_many(cls, ids, status, decided_by, rejection_reason=""):
+        """Approve or reject the Pending requests among ``ids`` in one transaction.
+
+        The requests are locked and checked in one query, written with a
+        single bulk_update, and the ledger gets one adjustment per affected
+        balance row. Returns ``{id: None or error message}`` in ``ids`` order.
+        """
+        ids = list(dict.fromkeys(ids))
+        results = {}
+        with transaction.atomic():
+            requests = cls.objects.select_for_update().in_bulk(ids)
+            now = timezone.now()
+            decided = []
+            deltas = defaultdict(lambda: [0, 0])
+            for pk in ids:
+                leave_request = requests.get(pk)
+                if leave_request is None:
+                    results[pk] = cls.NOT_FOUND
+                    continue
+                if leave_request.status != "Pending":
+                    results[pk] = "Leave request already processed."
+                    continue
+
+                key, _, pending = leave_request.balance_contribution()
+                leave_request.status = status
+                leave_request.approved_by = decided_by
+                leave_request.approved_at = now
+                leave_request.rejection_reason = rejection_reason
+                leave_request.updated_at = now
+                # Pending days move to used on approval and are released on rejection
+                deltas[key][1] -= pending
+                if status == "Approved":
+                    deltas[key][0] += pending
+                decided.append(leave_request)
+                results[pk] = None
+
+            cls.objects.bulk_update(decided, cls.DECISION_FIELDS)
+            for key, (used, pending) in deltas.items():
+                if used or pending:
+                    LeaveBalance.adjust(*key, used=used, pending=pending)
+        return results
+
+
+class LeaveBalance(models.Model):
+    """Per employee, leave type and year ledger of used and pending leave days.
+
+    Maintained by LeaveRequest.save()/delete() so balance reads never have to
+    scan leave history; rebuild_leave_balances reconciles it from scratch.
+    """
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField()
+    used = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("employee", "leave_type", "year")
+
+    def __str__(self):
+        return f"{self.employee} - {self.leave_type.name} {self.year}"
+
+    @classmethod
+    def adjust(cls, employee_id, leave_type_id, year, used=0, pending=0):
+        """Add ``used``/``pending`` deltas to the ledger row with a single UPDATE."""
+        with transaction.atomic():
+            updated = cls.objects.filter(employee_id=employee_id, leave_type_id=leave_type_id, year=year).update(
+                used=models.F("used") + used,
+                pending=models.F("pending") + pending,
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                balance, created = cls.objects.get_or_create(
+                    employee_id=employee_id, leave_type_id=leave_type_id, year=year,
+                    defaults={"used": used, "pending": pending},
+                )
+                if not created:
+                    # Another transaction created the row between our UPDATE and INSERT
+                    cls.objects.filter(pk=balance.pk).update(
+                        used=models.F("used") + used,
+                        pending=models.F("pending") + pending,
+                        updated_at=timezone.now(),
                     )
 
+    @classmethod
+    def rebuild(cls, year=None):
+        """Recompute the ledger (for one year, or all of it) from LeaveRequest rows.
+
+        The ledger rows are locked before the requests are read. A concurrent
+        create/approve/reject that has not committed yet then waits in
+        adjust() and applies its delta on top of the rebuilt totals, so no
+        change is lost. Returns the number of balance rows written.
+        """
+        requests = LeaveRequest.objects.filter(status__in=["Pending", "Approved"]).only(
+            "employee_id", "leave_type_id", "start_date", "end_date", "status"
+        )
+        balances = cls.objects.all()
+        if year:
+            requests = requests.filter(start_date__year=year)
+            balances = balances.filter(year=year)
+
+        with transaction.atomic():
+            existing = {
+                (balance.employee_id, balance.leave_type_id, balance.year): balance
+                for balance in balances.select_for_update()
+            }
+
+            totals = defaultdict(lambda: [0, 0])
+            for leave_request in requests.iterator():
+                key, used, pending = leave_request.balance_contribution()
+                totals[key][0] += used
+                totals[key][1] += pending
+
+            changed, created = [], []
+            for key, (used, pending) in totals.items():
+                balance = existing.pop(key, None)
+                if balance is None:
+                    employee_id, leave_type_id, balance_year = key
+                    created.append(cls(employee_id=employee_id, leave_type_id=leave_type_id, year=balance_year,
+                                       used=used, pending=pending))
+                elif (balance.used, balance.pending) != (used, pending):
+                    balance.used, balance.pending, balance.updated_at = used, pending, timezone.now()
+                    changed.append(balance)
+            cls.objects.bulk_update(changed, ["used", "pending", "updated_at"], batch_size=1000)
+            cls.objects.bulk_create(created, batch_size=1000)
+            # Rows left over have no Pending/Approved requests any more
+            cls.objects.filter(pk__in=[balance.pk for balance in existing.values()]).delete()
+        return len(totals)
+
+
+class Holiday(models.Model):
+    """A company holiday; not counted as a leave day."""
+
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        ordering = ["date"]
+
+    def __str__(self):
+        return f"{self.date} - {self.name}"
+
     def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            previous = Holiday.objects.filter(pk=self.pk).values_list("date", flat=True).first() if self.pk else None
+            super().save(*args, **kwargs)
+            self._calendar_changed({self.date, previous or self.date})
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self._calendar_changed({self.date})
+        return result
+
+    @staticmethod
+    def _calendar_changed(days):
+        """Leave day counts changed: recount the affected ledger years.
+
+        A leave is charged to its start year, so one that starts the year
+        before a January holiday is affected too.
+        """
+        clear_workday_cache()
+        transaction.on_commit(clear_workday_cache)
+        for year in sorted({year for day in days for year in (day.year - 1, day.year)}):
+            LeaveBalance.rebuild(year)
+
+
+class LeaveAccrualSnapshot(models.Model):
+    """Entitlement of one employee for one leave type at the start of a month.
+
+    Written by run_leave_accrual for leave types that accrue monthly or carry
+    days forward. ``entitlement`` is what the employee may take in the year
+    up to this month (carried_forward + accrued); subtracting the year's
+    LeaveBalance gives the available balance without reading leave history.
+    """
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.CASCADE)
+    period = models.DateField(help_text="First day of the month")
+    carried_forward = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    accrued = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    entitlement = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("employee", "leave_type", "period")
+
+    def __str__(self):
+        return f"{self.employee} - {self.leave_type.name} {self.period:%Y-%m}"
+
+    @classmethod
+    def latest(cls, employee_id, leave_type_id, day):
+        """The newest snapshot of ``day``'s year at or before ``day``, as a queryset."""
+        return cls.objects.filter(
+            employee_id=employee_id, leave_type_id=leave_type_id,
+            period__year=day.year, period__lte=day,
+        ).order_by("-period")[:1]
+
+    @classmethod
+    def accrue(cls, period):
+        """Write the snapshots for ``period`` (a month start) from the previous month's.
+
+        Each month adds ``monthly_accrual`` up to ``max_days_per_year``; types
+        without monthly accrual get the full quota. In January the unused
+        part of December's entitlement (less the year's used days, from
+        LeaveBalance) is carried forward up to ``carry_forward_cap``.
+        Rerunning a period overwrites it. Returns the number of rows written.
+        """
+        leave_types = list(LeaveType.objects.filter(is_active=True).filter(
+            models.Q(monthly_accrual__gt=0) | models.Q(carry_forward_cap__gt=0)
+        ))
+        employee_ids = list(Employee.objects.values_list("id", flat=True))
+        previous_period = (period - datetime.timedelta(days=1)).replace(day=1)
+        previous = {
+            (snapshot.employee_id, snapshot.leave_type_id): snapshot
+            for snapshot in cls.objects.filter(period=previous_period, leave_type__in=leave_types)
+        }
+        used_last_year = {}
+        if period.month == 1:
+            used_last_year = {
+                (employee_id, leave_type_id): used
+                for employee_id, leave_type_id, used in LeaveBalance.objects.filter(
+                    year=period.year - 1, leave_type__in=leave_types
+                ).values_list("employee_id", "leave_type_id", "used")
+            }
+
+        snapshots = []
+        for leave_type in leave_types:
+            rate = leave_type.monthly_accrual
+            quota = Decimal(leave_type.max_days_per_year)
+            for employee_id in employee_ids:
+                key = (employee_id, leave_type.pk)
+                last = previous.get(key)
+                if period.month == 1:
+                    unused = last.entitlement - used_last_year.get(key, 0) if last else 0
+                    carried = min(Decimal(leave_type.carry_forward_cap), max(unused, 0))
+                    accrued_before = 0
+                else:
+                    carried = last.carried_forward if last else 0
+                    # First run mid-year: assume the months so far were accrued
+                    accrued_before = last.accrued if last else rate * (period.month - 1)
+                accrued = min(accrued_before + rate, quota) if rate else quota
+                snapshots.append(cls(
+                    employee_id=employee_id, leave_type=leave_type, period=period,
+                    carried_forward=carried, accrued=accrued, entitlement=carried + accrued,
+                ))
+
+        with transaction.atomic():
+            cls.objects.bulk_create(
+                snapshots,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=["employee", "leave_type", "period"],
+                update_fields=["carried_forward", "accrued", "entitlement", "updated_at"],
+            )
+        return len(snapshots)
@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination
+
+
+class LeaveRequestCursorPagination(CursorPagination):
+    """Newest-first keyset pages over leave requests.
+
+    The cursor encodes the last ``created_at`` seen, so every page is an
+    index range scan on (status, created_at) or (employee, created_at)
+    rather than an OFFSET that grows with history.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = ("-created_at", "-id")
@@ -0,0 +1,507 @@
+import multiprocessing
+from bisect import bisect_right
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import django
+from django.db.models import Count, Exists, Max, OuterRef, Q, Sum
+
+from .models import (
+    IST,
+    Attendance,
+    AttendanceDailySummary,
+    Employee,
+    LeaveRequest,
+    Permission,
+    ReportDataVersion,
+    attendance_totals,
+    day_status_expression,
+)
+
+EXPORT_HEADERS = [
+    "Date", "Employee ID", "Employee Name", "Department",
+    "Check In", "Check Out", "Status", "Working Hours", "Permissions", "Remarks",
+]
+
+# Days of Attendance/Permission rows held in memory at once while exporting
+EXPORT_CHUNK_DAYS = 7
+
+# Employee x day cells rendered per dashboard page
+DASHBOARD_PAGE_SIZE = 100
+
+# Reports shorter than this are generated serially; longer ones are sharded by date
+PARALLEL_MIN_DAYS = 60
+
+
+# ----------------------------
+# Bulk permission loading
+# ----------------------------
+class PermissionWindow:
+    """A Permission reduced to what the dashboard and exports display."""
+
+    __slots__ = ("start_time", "end_time", "status")
+
+    def __init__(self, start_time, end_time, status):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.status = status
+
+    @property
+    def start_time_str(self):
+        return self.start_time.strftime("%I:%M %p") if self.start_time else "-"
+
+    @property
+    def end_time_str(self):
+        return self.end_time.strftime("%I:%M %p") if self.end_time else "-"
+
+
+def load_permissions(employee_ids, start, end):
+    """Fetch every Permission for the employees and date window in one query.
+
+    Returns a dict keyed by ``(employee_id, date)`` holding the permissions
+    for that day in start-time order, regardless of status.
+    """
+    permission_map = defaultdict(list)
+    if not employee_ids:
+        return permission_map
+
+    permissions = Permission.objects.filter(
+        employee_id__in=employee_ids,
+        date__range=(start, end),
+    ).order_by("start_time").values_list("employee_id", "date", "start_time", "end_time", "status")
+    for employee_id, day, start_time, end_time, status in permissions:
+        permission_map[(employee_id, day)].append(PermissionWindow(start_time, end_time, status))
+    return permission_map
+
+
+# ----------------------------
+# Approved leave lookup
+# ----------------------------
+class LeaveIntervals:
+    """Approved leave per employee pk as sorted, non-overlapping date intervals.
+
+    ``covers()`` is a binary search over one employee's interval starts, so
+    tagging a grid cell costs O(log leaves) and no query.
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self):
+        self.starts = defaultdict(list)
+        self.ends = defaultdict(list)
+
+    def add(self, employee_pk, start, end):
+        """Add an interval; intervals must arrive in start-date order per employee."""
+        starts, ends = self.starts[employee_pk], self.ends[employee_pk]
+        if ends and start <= ends[-1] + timedelta(days=1):
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+
+    def covers(self, employee_pk, day):
+        starts = self.starts.get(employee_pk)
+        if not starts:
+            return False
+        index = bisect_right(starts, day) - 1
+        return index >= 0 and self.ends[employee_pk][index] >= day
+
+    def covered_days(self, start, end):
+        """Employee-days within ``start``..``end`` that fall on approved leave."""
+        return sum(
+            (min(leave_end, end) - max(leave_start, start)).days + 1
+            for employee_pk, starts in self.starts.items()
+            for leave_start, leave_end in zip(starts, self.ends[employee_pk])
+            if leave_start <= end and leave_end >= start
+        )
+
+
+def approved_leave(employee_ids, start, end):
+    """Approved LeaveRequests overlapping the window for ``employee_ids``."""
+    return LeaveRequest.objects.filter(
+        employee_id__in=employee_ids,
+        status="Approved",
+        start_date__lte=end,
+        end_date__gte=start,
+    )
+
+
+def load_leaves(employee_ids, start, end):
+    """Fetch the approved leave overlapping the window in one query as ``LeaveIntervals``.
+
+    ``employee_ids`` is a list or set of primary keys.
+    """
+    intervals = LeaveIntervals()
+    if not employee_ids:
+        return intervals
+
+    leaves = approved_leave(employee_ids, start, end).order_by("employee_id", "start_date")
+    for employee_pk, leave_start, leave_end in leaves.values_list("employee_id", "start_date", "end_date"):
+        intervals.add(employee_pk, leave_start, leave_end)
+    return intervals
+
+
+def on_leave_total(start, end, employee_ids):
+    """Employee-days in the range on approved leave with no Attendance row.
+
+    These are the cells shown as On Leave; they are counted out of absent.
+    """
+    covered = load_leaves(employee_ids, start, end).covered_days(start, end)
+    if not covered:
+        return 0
+    on_leave_that_day = LeaveRequest.objects.filter(
+        employee_id=OuterRef("employee_id"),
+        status="Approved",
+        start_date__lte=OuterRef("date"),
+        end_date__gte=OuterRef("date"),
+    )
+    attended = Attendance.objects.filter(
+        employee_id__in=employee_ids, date__range=(start, end)
+    ).filter(Exists(on_leave_that_day)).count()
+    return covered - attended
+
+
+# ----------------------------
+# Grid rows
+# ----------------------------
+EMPLOYEE_ROW_FIELDS = ("id", "employee_id", "user__name", "department__name")
+ATTENDANCE_ROW_FIELDS = ("employee_id", "date", "check_in", "check_out", "remarks", "working_hours", "day_status")
+
+
+class AttendanceRow:
+    """One employee-day cell shared by the dashboard, its template and the exports.
+
+    Built from ``.values()`` rows so no model instances are hydrated; a
+    missing Attendance row is simply a row with ``has_record`` False.
+    """
+
+    __slots__ = (
+        "date", "employee_id", "employee_name", "department", "has_record",
+        "status", "check_in", "check_out", "calculated_hours", "permissions", "remarks",
+    )
+
+    def __init__(self, day, employee, record=None, permissions=(), on_leave=False):
+        self.date = day
+        self.employee_id = employee["employee_id"]
+        self.employee_name = employee["user__name"]
+        self.department = employee["department__name"] or ""
+        self.has_record = record is not None
+        self.permissions = permissions
+        self.calculated_hours = None
+        if record is None:
+            self.status = "On Leave" if on_leave else "Absent"
+            self.check_in = self.check_out = None
+            self.remarks = ""
+            return
+
+        self.status = record["day_status"]
+        self.check_in = record["check_in"]
+        self.check_out = record["check_out"]
+        self.remarks = record["remarks"] or ""
+        if self.check_in and self.check_out:
+            self.calculated_hours = record["working_hours"]
+
+    @property
+    def check_in_str(self):
+        return self.check_in.astimezone(IST).strftime("%I:%M %p") if self.check_in else "-"
+
+    @property
+    def check_out_str(self):
+        return self.check_out.astimezone(IST).strftime("%I:%M %p") if self.check_out else "-"
+
+    def as_export_row(self):
+        """The row as written to the Excel export, in ``EXPORT_HEADERS`` order."""
+        if not self.has_record:
+            return [
+                self.date.strftime("%Y-%m-%d"), self.employee_id, self.employee_name, self.department,
+                "-", "-", self.status, "", "", "",
+            ]
+        permission_str = "\n".join(
+            f"{p.start_time_str}-{p.end_time_str} ({p.status})" for p in self.permissions
+        )
+        return [
+            self.date.strftime("%Y-%m-%d"),
+            self.employee_id,
+            self.employee_name,
+            self.department,
+            self.check_in_str if self.check_in else "",
+            self.check_out_str if self.check_out else "",
+            self.status,
+            self.calculated_hours or "",
+            permission_str.strip(),
+            self.remarks,
+        ]
+
+
+def load_attendance(employee_ids, start, end, attendance_filter=None):
+    """Attendance values for the window keyed by ``(employee pk, date)``, status annotated."""
+    attendance_qs = Attendance.objects.filter(employee_id__in=employee_ids, date__range=(start, end))
+    if attendance_filter is not None:
+        attendance_qs = attendance_qs.filter(attendance_filter)
+    attendance_qs = attendance_qs.annotate(day_status=day_status_expression()).values(*ATTENDANCE_ROW_FIELDS)
+    return {(a["employee_id"], a["date"]): a for a in attendance_qs}
+
+
+# ----------------------------
+# Dashboard grid (keyset paginated)
+# ----------------------------
+def filter_employees(employee_filter="", department_filter=""):
+    """Employees matching the dashboard's name/ID search and department filter."""
+    employees = Employee.objects.all()
+    if employee_filter:
+        employees = employees.filter(
+            Q(employee_id__icontains=employee_filter) |
+            Q(user__name__icontains=employee_filter)
+        )
+    if department_filter:
+        employees = employees.filter(department_id=department_filter)
+    return employees
+
+
+def parse_grid_cursor(cursor):
+    """Split a ``YYYY-MM-DD.<employee pk>`` cursor; returns None if it is malformed."""
+    try:
+        day, employee_pk = cursor.split(".")
+        return datetime.strptime(day, "%Y-%m-%d").date(), int(employee_pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def grid_page(employee_ids, start, end, cursor=None, page_size=DASHBOARD_PAGE_SIZE):
+    """One page of the (date, employee) grid ordered by date, then employee pk.
+
+    ``employee_ids`` must be sorted. The cursor is the last cell of the
+    previous page, so pages stay stable when employees are added or removed.
+    Returns the ``(date, employee_id)`` cells and the cursor for the next
+    page, or None when this is the last page.
+    """
+    if not employee_ids:
+        return [], None
+
+    day, index = start, 0
+    position = parse_grid_cursor(cursor) if cursor else None
+    if position and start <= position[0] <= end:
+        day, index = position[0], bisect_right(employee_ids, position[1])
+
+    cells = []
+    while day <= end and len(cells) < page_size:
+        if index >= len(employee_ids):
+            day, index = day + timedelta(days=1), 0
+            continue
+        cells.append((day, employee_ids[index]))
+        index += 1
+
+    if index >= len(employee_ids):
+        day, index = day + timedelta(days=1), 0
+    if not cells or day > end:
+        return cells, None
+    last_day, last_employee = cells[-1]
+    return cells, f"{last_day:%Y-%m-%d}.{last_employee}"
+
+
+def grid_totals(start, end, employees, headcount):
+    """Present, late, absent and total hours for a set of employees over a range.
+
+    Classification and sums run in the database; absent is every remaining
+    employee-day, i.e. the anti-join of the grid against Present/Late rows.
+    """
+    present, late, total_hours = attendance_totals(
+        Attendance.objects.filter(employee__in=employees, date__range=(start, end))
+    )
+    days = (end - start).days + 1
+    absent = max(headcount * days - present - late, 0)
+    return present, late, absent, total_hours
+
+
+# ----------------------------
+# Daily rollup reads
+# ----------------------------
+def rollup_totals(start, end, headcount, department_id=None):
+    """Present, late, absent and total hours for a range from AttendanceDailySummary.
+
+    Reads one row per (day, department) instead of the employee x day grid.
+    Absent is the complement of present + late over ``headcount`` employees,
+    so days nobody checked in on need no rollup row at all.
+    """
+    summaries = AttendanceDailySummary.objects.filter(date__range=(start, end))
+    if department_id:
+        summaries = summaries.filter(department_id=department_id)
+
+    totals = summaries.aggregate(
+        present=Sum("present_count"),
+        late=Sum("late_count"),
+        hours=Sum("total_working_hours"),
+    )
+    present = totals["present"] or 0
+    late = totals["late"] or 0
+    days = (end - start).days + 1
+    absent = max(headcount * days - present - late, 0)
+    return present, late, absent, totals["hours"] or 0
+
+
+# ----------------------------
+# Export rows
+# ----------------------------
+def iter_attendance_rows(start, end, employee_filter="", department_filter=""):
+    """Yield an ``AttendanceRow`` per employee per day, oldest day first.
+
+    Attendance and permissions are fetched ``EXPORT_CHUNK_DAYS`` at a time so
+    memory stays bounded by the chunk, not by the length of the range.
+    """
+    employees = Employee.objects.order_by("id")
+    if department_filter:
+        employees = employees.filter(department_id=department_filter)
+    employees = list(employees.values(*EMPLOYEE_ROW_FIELDS))
+    employee_ids = [emp["id"] for emp in employees]
+
+    # The name/ID search narrows which attendance is reported, not the roster
+    attendance_filter = None
+    if employee_filter:
+        attendance_filter = (
+            Q(employee__employee_id__icontains=employee_filter) |
+            Q(employee__user__name__icontains=employee_filter)
+        )
+
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=EXPORT_CHUNK_DAYS - 1), end)
+        attendance_map = load_attendance(employee_ids, chunk_start, chunk_end, attendance_filter)
+        permission_map = load_permissions({emp_id for emp_id, _ in attendance_map}, chunk_start, chunk_end)
+        leaves = load_leaves(employee_ids, chunk_start, chunk_end)
+
+        current = chunk_start
+        while current <= chunk_end:
+            for emp in employees:
+                key = (emp["id"], current)
+                yield AttendanceRow(
+                    current, emp, attendance_map.get(key), permission_map.get(key, ()),
+                    leaves.covers(emp["id"], current),
+                )
+            current += timedelta(days=1)
+
+        chunk_start = chunk_end + timedelta(days=1)
+
+
+# ----------------------------
+# Parallel (date-sharded) report rows
+# ----------------------------
+def split_date_range(start, end, shards):
+    """Split ``start``..``end`` into at most ``shards`` contiguous (start, end) ranges."""
+    days = (end - start).days + 1
+    size = max(-(-days // shards), EXPORT_CHUNK_DAYS)
+    ranges = []
+    shard_start = start
+    while shard_start <= end:
+        shard_end = min(shard_start + timedelta(days=size - 1), end)
+        ranges.append((shard_start, shard_end))
+        shard_start = shard_end + timedelta(days=1)
+    return ranges
+
+
+def _init_shard_worker():
+    # Spawned workers start from a fresh interpreter and open their own connections
+    django.setup()
+
+
+def _shard_rows(args):
+    return list(iter_attendance_rows(*args))
+
+
+def iter_report_rows(start, end, employee_filter="", department_filter="", workers=1):
+    """``iter_attendance_rows`` spread over a process pool for long ranges.
+
+    The range is split into date shards (a few per worker) that are computed
+    in separate processes, each with its own DB connection, and yielded back
+    in date order. Only ``workers * 2`` shards are in flight at once so the
+    parent never buffers the whole report. Workers are spawned rather than
+    forked, so the caller's connection (and any transaction on it) is left
+    alone.
+    """
+    if workers <= 1 or (end - start).days + 1 < PARALLEL_MIN_DAYS:
+        yield from iter_attendance_rows(start, end, employee_filter, department_filter)
+        return
+
+    shards = split_date_range(start, end, workers * 4)
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_shard_worker
+    ) as pool:
+        pending = deque()
+        shard_iter = iter(shards)
+        for shard_start, shard_end in shard_iter:
+            pending.append(pool.submit(_shard_rows, (shard_start, shard_end, employee_filter, department_filter)))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            rows = pending.popleft().result()
+            next_shard = next(shard_iter, None)
+            if next_shard:
+                pending.append(pool.submit(_shard_rows, (*next_shard, employee_filter, department_filter)))
+            yield from rows
+
+
+# ----------------------------
+# Leave calendar
+# ----------------------------
+def leave_calendar_version(month_start):
+    """Fingerprint of the data leave_calendar reads for the month of ``month_start``.
+
+    Read from the database so every worker sees a change once it commits: any
+    leave overlapping the month that is created, decided, edited or deleted
+    moves the Max(updated_at)/Count pair, and roster edits (names,
+    departments) bump ReportDataVersion.
+    """
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    leave = LeaveRequest.objects.filter(start_date__lte=month_end, end_date__gte=month_start).aggregate(
+        updated=Max("updated_at"), rows=Count("id")
+    )
+    updated = leave["updated"].isoformat() if leave["updated"] else ""
+    return f"{updated}:{leave['rows']}:{ReportDataVersion.current()}"
+
+
+def leave_calendar(month_start, department_id=None):
+    """Per-day approved-leave headcount and names for the month of ``month_start``.
+
+    One query fetches the approved leaves overlapping the month. Each leave is
+    clipped to the month and recorded as a +1 on its first day and a -1 on the
+    day after its last (a difference array), so a single sweep over the days
+    yields every day's headcount in O(leaves + days) without testing each day
+    against each leave.
+    """
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    days = (month_end - month_start).days + 1
+
+    leaves = LeaveRequest.objects.filter(
+        status="Approved", start_date__lte=month_end, end_date__gte=month_start
+    )
+    if department_id:
+        leaves = leaves.filter(employee__department_id=department_id)
+
+    diff = [0] * (days + 1)
+    starting = defaultdict(list)
+    ending = defaultdict(list)
+    for pk, start, end, employee_id, name in leaves.values_list(
+        "id", "start_date", "end_date", "employee__employee_id", "employee__user__name"
+    ):
+        first = max((start - month_start).days, 0)
+        after_last = min((end - month_start).days, days - 1) + 1
+        diff[first] += 1
+        diff[after_last] -= 1
+        starting[first].append((pk, employee_id, name))
+        ending[after_last].append(pk)
+
+    calendar = []
+    count = 0
+    on_leave = {}
+    for offset in range(days):
+        count += diff[offset]
+        for pk in ending.get(offset, ()):
+            del on_leave[pk]
+        for pk, employee_id, name in starting.get(offset, ()):
+            on_leave[pk] = {"employee_id": employee_id, "name": name}
+        calendar.append({
+            "date": (month_start + timedelta(days=offset)).isoformat(),
+            "count": count,
+            "employees": sorted(on_leave.values(), key=lambda employee: employee["name"]),
+        })
+    return calendar
@@ -1,2 +1,192 @@
-from django.test import TestCase
+import threading
+from datetime import date, datetime, timedelta
 
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .models import Attendance, AttendanceDailySummary, Department, Employee, LeaveBalance, LeaveRequest, LeaveType, User
+
+THREADS = 8
+
+
+def run_concurrently(func, count=THREADS):
+    """Call ``func`` from ``count`` threads released together; returns their results.
+
+    An exception raised in a thread is returned in place of its result.
+    """
+    barrier = threading.Barrier(count)
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            barrier.wait()
+            result = func()
+        except Exception as e:
+            result = e
+        finally:
+            connection.close()
+        with lock:
+            results.append(result)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class AttendanceConcurrencyTests(TransactionTestCase):
+    """Simultaneous check-in/out taps for one employee and day."""
+
+    def setUp(self):
+        user = User.objects.create_user("emp@example.com", "Employee", "pw")
+        self.employee = Employee.objects.create(user=user, department=Department.objects.create(name="Dev"))
+        self.day = date(2026, 3, 2)
+
+    def assertNoErrors(self, results):
+        errors = [result for result in results if isinstance(result, Exception)]
+        self.assertEqual(errors, [])
+
+    def test_exactly_one_check_in_wins(self):
+        check_in = datetime(2026, 3, 2, 9, 30)
+        results = run_concurrently(lambda: Attendance.record_check_in(self.employee, self.day, check_in))
+
+        self.assertNoErrors(results)
+        self.assertEqual([result for result in results if result is not None], ["Present"])
+        self.assertEqual(Attendance.objects.filter(employee=self.employee, date=self.day).count(), 1)
+        self.assertEqual(AttendanceDailySummary.objects.get(date=self.day).present_count, 1)
+
+    def test_exactly_one_check_in_wins_over_existing_row(self):
+        Attendance.objects.create(employee=self.employee, date=self.day)
+        check_in = datetime(2026, 3, 2, 10, 15)
+        results = run_concurrently(lambda: Attendance.record_check_in(self.employee, self.day, check_in))
+
+        self.assertNoErrors(results)
+        self.assertEqual([result for result in results if result is not None], ["Late"])
+        self.assertEqual(Attendance.objects.filter(employee=self.employee, date=self.day).count(), 1)
+
+    def test_exactly_one_check_out_wins(self):
+        Attendance.record_check_in(self.employee, self.day, datetime(2026, 3, 2, 9, 0))
+        check_outs = iter(datetime(2026, 3, 2, 17, minute) for minute in range(THREADS))
+        lock = threading.Lock()
+
+        def check_out():
+            with lock:
+                check_out_time = next(check_outs)
+            return Attendance.record_check_out(self.employee, self.day, check_out_time)
+
+        results = run_concurrently(check_out)
+
+        self.assertNoErrors(results)
+        winners = [attendance for attendance, error in results if error is None]
+        self.assertEqual(len(winners), 1)
+        self.assertEqual(sorted(error for _, error in results if error), ["Already checked out"] * (THREADS - 1))
+
+        stored = Attendance.objects.get(employee=self.employee, date=self.day)
+        self.assertEqual(stored.check_out, winners[0].check_out)
+        self.assertEqual(stored.working_hours, round((stored.check_out - stored.check_in) / timedelta(hours=1), 2))
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class LeaveRequestConcurrencyTests(TransactionTestCase):
+    """Simultaneous leave submissions that together exceed the balance.
+
+    Needs a backend with row locks; SQLite ignores select_for_update.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user("emp@example.com", "Employee", "pw")
+        self.employee = Employee.objects.create(user=user)
+        self.token = Token.objects.create(user=user)
+        self.leave_type = LeaveType.objects.create(name="Casual", max_days_per_year=5)
+
+    def test_concurrent_requests_never_overdraw(self):
+        # Monday-Tuesday of consecutive weeks: 2 working days each, no overlaps
+        mondays = iter(date(2030, 1, 7) + timedelta(weeks=week) for week in range(THREADS))
+        lock = threading.Lock()
+
+        def submit():
+            with lock:
+                monday = next(mondays)
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+            response = client.post("/api/leave/request/", {
+                "leave_type": self.leave_type.pk,
+                "start_date": monday.isoformat(),
+                "end_date": (monday + timedelta(days=1)).isoformat(),
+                "reason": "Concurrent",
+            }, format="json")
+            return response.status_code, response.json().get("error", "")
+
+        results = run_concurrently(submit)
+
+        # Only two fit in the quota; every other request is refused for the balance alone
+        self.assertEqual([status for status, _ in results].count(201), 2)
+        rejections = [error for status, error in results if status != 201]
+        self.assertEqual(len(rejections), THREADS - 2)
+        for error in rejections:
+            self.assertTrue(error.startswith("Insufficient leave balance"), error)
+        balance = LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type, year=2030)
+        self.assertEqual((balance.pending, balance.used), (4, 0))
+        self.assertEqual(LeaveRequest.objects.filter(employee=self.employee).count(), 2)
+
+
+class RequestEmployeeTests(TestCase):
+    """Mobile APIs work whichever authentication class identified the caller."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("emp@example.com", "Employee", "pw")
+        self.employee = Employee.objects.create(user=self.user)
+
+    def test_force_authenticated_request_resolves_employee(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get("/api/attendance/today/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["attendance"]["status"], "Absent")
+
+    def test_user_without_employee_profile_gets_404(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("admin@example.com", "Admin", "pw"))
+        self.assertEqual(client.get("/api/leave/balance/").status_code, 404)
+
+
+class LeaveDecisionTests(TestCase):
+    """Deciding one request twice must not move the ledger twice."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin@example.com", "Admin", "pw")
+        self.employee = Employee.objects.create(user=User.objects.create_user("emp@example.com", "Employee", "pw"))
+        self.leave_type = LeaveType.objects.create(name="Casual", max_days_per_year=12)
+        # Monday to Friday: 5 working days
+        self.leave = LeaveRequest.objects.create(
+            employee=self.employee, leave_type=self.leave_type,
+            start_date=date(2030, 1, 7), end_date=date(2030, 1, 11), reason="Trip",
+        )
+
+    def balance(self):
+        balance = LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type, year=2030)
+        return balance.used, balance.pending
+
+    def test_stale_instances_follow_the_stored_row(self):
+        first = LeaveRequest.objects.get(pk=self.leave.pk)
+        second = LeaveRequest.objects.get(pk=self.leave.pk)
+        first.status = "Approved"
+        first.save(update_fields=LeaveRequest.DECISION_FIELDS)
+        second.status = "Rejected"
+        second.save(update_fields=LeaveRequest.DECISION_FIELDS)
+        self.assertEqual(self.balance(), (0, 0))
+
+    def test_second_decision_is_refused(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.post(f"/api/leave/{self.leave.pk}/approve/").status_code, 200)
+        response = client.post(f"/api/leave/{self.leave.pk}/reject/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(LeaveRequest.objects.get(pk=self.leave.pk).status, "Approved")
+        self.assertEqual(self.balance(), (5, 0))
+        self.assertEqual(client.post("/api/leave/999999/approve/").status_code, 404)
@@ -1,53 +1,69 @@
-import math
+import os
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import HttpResponse, FileResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Q
+from django.db.models import Count, Q
+from django.db import transaction
+from django.core.cache import cache
+from django.core.paginator import Paginator
 from datetime import datetime, date, time, timedelta
-from io import BytesIO
-import openpyxl
 import string, secrets
 import pytz
 
 # DRF imports
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework import serializers
 
 # Models and serializers
-from .models import Employee, Department, Attendance, Permission, User
+from .models import Employee, Department, Attendance, Permission, User, ExportJob, TODAY_CACHE_SECONDS
+from .authentication import EmployeeTokenAuthentication, forget_token, get_request_employee
+from .geofence import locate_office, nearest_office
+from .identifiers import resolve_employee
 from .serializers import EmployeeSerializer, PermissionSerializer
+from .reports import (
+    EMPLOYEE_ROW_FIELDS,
+    AttendanceRow,
+    LeaveIntervals,
+    load_attendance,
+    load_leaves,
+    load_permissions,
+    on_leave_total,
+    rollup_totals,
+    filter_employees,
+    grid_page,
+    grid_totals,
+    iter_report_rows,
+)
+from .exports import (
+    EXPORT_CONTENT_TYPES,
+    build_export,
+    cached_export_path,
+    export_cache_key,
+    iter_csv,
+    parquet_available,
+)
 
 User = get_user_model()
 IST = pytz.timezone("Asia/Kolkata")
 
 
-CUTOFF_TIME = time(10, 15)  
-ABSENT_TIME = time(12, 0)   
-
-# Geofencing Constants (Office Coordinates and Allowed Radius in Meters)
-OFFICE_LAT = 8.1631162
-OFFICE_LON = 77.4108498
-ALLOWED_RADIUS = 200  # 200 meters
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate the distance between two coordinates in meters using Haversine formula."""
-    R = 6371000  # Radius of Earth in meters
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-
-    a = math.sin(dphi / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
+def _outside_office_response(lat, lon):
+    office, distance = nearest_office(lat, lon)
+    if office is None:
+        return Response({"error": "No office locations are configured"}, status=400)
+    return Response({
+        "error": f"You are outside the office range ({round(distance)}m from {office.name}). "
+                 f"Allowed radius is {office.radius_meters}m."
+    }, status=400)
 
 
 @csrf_exempt
@@ -86,77 +102,56 @@ def attendance_dashboard(request):
         start = end = date.today()
 
     try:
-        attendance_qs = Attendance.objects.select_related("employee__user", "employee__department").filter(date__range=(start, end))
+        employees = filter_employees(employee_filter, department_filter)
+        employee_ids = list(employees.order_by("id").values_list("id", flat=True))
+
+        # Only the cells of the requested page are hydrated
+        cells, next_cursor = grid_page(employee_ids, start, end, request.GET.get("cursor"))
+        page_employee_ids = {employee_id for _, employee_id in cells}
+        page_employees = {
+            emp["id"]: emp for emp in Employee.objects.filter(id__in=page_employee_ids).values(*EMPLOYEE_ROW_FIELDS)
+        }
 
-        # Apply employee filter (search by employee id or name)
-        if employee_filter:
-            attendance_qs = attendance_qs.filter(
-                Q(employee__employee_id__icontains=employee_filter) |
-                Q(employee__user__name__icontains=employee_filter)
+        attendance_map = {}
+        permission_map = {}
+        leaves = LeaveIntervals()
+        if cells:
+            page_start, page_end = cells[0][0], cells[-1][0]
+            attendance_map = load_attendance(page_employee_ids, page_start, page_end)
+            # Hours are stored on Attendance; permissions are only needed for display
+            if request.user.is_superuser:
+                permission_map = load_permissions(page_employee_ids, page_start, page_end)
+            leaves = load_leaves(page_employee_ids, page_start, page_end)
+
+        updated_attendance = [
+            AttendanceRow(
+                current_date,
+                page_employees[employee_id],
+                attendance_map.get((employee_id, current_date)),
+                permission_map.get((employee_id, current_date), ()),
+                leaves.covers(employee_id, current_date),
             )
+            for current_date, employee_id in cells
+        ]
 
-        # Filter by department if given (department id)
-        if department_filter:
-            attendance_qs = attendance_qs.filter(employee__department_id=department_filter)
-
-        attendance_map = {(a.employee_id, a.date): a for a in attendance_qs}
-
-        updated_attendance = []
-        employees = Employee.objects.all()
-        if department_filter:
-            employees = employees.filter(department_id=department_filter)
-
-        current_date = start
-        while current_date <= end:
-            for emp in employees:
-                record = attendance_map.get((emp.id, current_date))
-                if record:
-                    record.approved_permissions = []
-                    if request.user.is_superuser:
-                        permissions = Permission.objects.filter(employee=record.employee, date=record.date)
-                        for p in permissions:
-                            p.start_time_str = p.start_time.strftime("%I:%M %p") if p.start_time else "-"
-                            p.end_time_str = p.end_time.strftime("%I:%M %p") if p.end_time else "-"
-                            record.approved_permissions.append(p)
-                    record.calculated_hours = None
-                    if not record.check_in:
-                        record.status = "Absent"
-                        record.check_in_str = "-"
-                        record.check_out_str = "-"
-                    else:
-                        local_checkin = record.check_in.astimezone(IST).time()
-                        if local_checkin > ABSENT_TIME:
-                            record.status = "Absent"
-                        elif local_checkin > CUTOFF_TIME:
-                            record.status = "Late"
-                        else:
-                            record.status = "Present"
-                        record.check_in_str = record.check_in.astimezone(IST).strftime("%I:%M %p")
-                        if record.check_out:
-                            record.check_out_str = record.check_out.astimezone(IST).strftime("%I:%M %p")
-                            record.calculated_hours = record.working_hours
-                        else:
-                            record.check_out_str = "-"
-                    updated_attendance.append(record)
-                else:
-                    # No attendance record → mark as absent
-                    temp = type("TempAttendance", (), {})()
-                    temp.employee = emp
-                    temp.date = current_date
-                    temp.status = "Absent"
-                    temp.check_in_str = "-"
-                    temp.check_out_str = "-"
-                    temp.calculated_hours = None
-                    temp.approved_permissions = []
-                    updated_attendance.append(temp)
-            current_date += timedelta(days=1)
-
-        # Summarize attendance counts and total working hours
+        # Summary counts cover the whole range, not just the rendered page
         total_employees = Employee.objects.count()
-        present_count = sum(1 for r in updated_attendance if r.status == "Present")
-        absent_count = sum(1 for r in updated_attendance if r.status == "Absent")
-        late_count = sum(1 for r in updated_attendance if r.status == "Late")
-        total_working_hours = sum(r.calculated_hours for r in updated_attendance if r.calculated_hours)
+        if employee_filter:
+            # The rollup is per department, so name/ID searches are aggregated directly
+            present_count, late_count, absent_count, total_working_hours = grid_totals(
+                start, end, employees, len(employee_ids)
+            )
+        else:
+            present_count, late_count, absent_count, total_working_hours = rollup_totals(
+                start, end, len(employee_ids), department_filter or None
+            )
+        # Days on approved leave without a check-in are On Leave, not Absent
+        on_leave_count = on_leave_total(start, end, employee_ids)
+        absent_count = max(absent_count - on_leave_count, 0)
+
+        # Query string for the pagination links, without the cursor itself
+        filter_params = request.GET.copy()
+        filter_params.pop("cursor", None)
 
         context = {
             "attendance": updated_attendance,
@@ -168,8 +163,12 @@ def attendance_dashboard(request):
             "total_employees": total_employees,
             "present_count": present_count,
             "absent_count": absent_count,
+            "on_leave_count": on_leave_count,
             "late_count": late_count,
             "total_working_hours": round(total_working_hours, 2),
+            "cursor": request.GET.get("cursor", ""),
+            "next_cursor": next_cursor,
+            "filter_query": filter_params.urlencode(),
         }
         return render(request, "home.html", context)
     
@@ -182,12 +181,12 @@ def attendance_dashboard(request):
 # Export Attendance Excel
 # -------------------------------
 
-@login_required(login_url="login")
-def export_attendance_excel(request):
-    start_date_str = request.GET.get("start_date")
-    end_date_str = request.GET.get("end_date")
-    employee_filter = request.GET.get("employee", "")
-    department_filter = request.GET.get("department", "")
+def _export_filters(params):
+    """Parse the date range and filters shared by the export endpoints."""
+    start_date_str = params.get("start_date")
+    end_date_str = params.get("end_date")
+    employee_filter = params.get("employee", "")
+    department_filter = params.get("department", "")
 
     try:
         start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date() if start_date_str else date.today()
@@ -199,93 +198,100 @@ def export_attendance_excel(request):
     except ValueError:
         end_date = start_date
 
-    attendance_qs = Attendance.objects.filter(date__range=(start_date, end_date)).select_related(
-        "employee__user", "employee__department"
+    return start_date, end_date, employee_filter, department_filter
+
+
+@login_required(login_url="login")
+def export_attendance_excel(request):
+    start_date, end_date, employee_filter, department_filter = _export_filters(request.GET)
+    file_format = request.GET.get("format", "xlsx")
+    if file_format not in EXPORT_CONTENT_TYPES:
+        return HttpResponse("Unsupported export format. Use xlsx, csv or parquet.", status=400)
+
+    filename = f"attendance_report_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.{file_format}"
+
+    if file_format == "csv":
+        # Rows are written as they are generated; nothing is buffered server side
+        rows = iter_report_rows(start_date, end_date, employee_filter, department_filter)
+        response = StreamingHttpResponse(iter_csv(rows), content_type=EXPORT_CONTENT_TYPES["csv"])
+        response["Content-Disposition"] = f"attachment; filename={filename}"
+        return response
+
+    if file_format == "parquet" and not parquet_available():
+        return HttpResponse("Parquet export requires pyarrow to be installed.", status=400)
+
+    # Served straight from the export cache when the same report was built before
+    path = build_export(start_date, end_date, employee_filter, department_filter, file_format=file_format)
+    # FileResponse streams the file in blocks instead of one in-memory copy
+    return FileResponse(
+        open(path, "rb"),
+        as_attachment=True,
+        filename=filename,
+        content_type=EXPORT_CONTENT_TYPES[file_format],
     )
 
-    if employee_filter:
-        attendance_qs = attendance_qs.filter(
-            Q(employee__employee_id__icontains=employee_filter) |
-            Q(employee__user__name__icontains=employee_filter)
+
+# -------------------------------
+# Background Export Jobs
+# -------------------------------
+
+def _export_job_data(job):
+    return {
+        "id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "error": job.error or None,
+        "download_url": reverse("download_export_job", args=[job.id]) if job.status == "Completed" else None,
+    }
+
+
+@login_required(login_url="login")
+def create_export_job(request):
+    """Queue an export for run_export_worker, or complete it at once from the cache."""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+
+    start_date, end_date, employee_filter, department_filter = _export_filters(request.POST)
+    cache_key = export_cache_key(start_date, end_date, employee_filter, department_filter)
+
+    job = ExportJob.objects.filter(cache_key=cache_key, status__in=["Pending", "Running"]).first()
+    if job is None:
+        job = ExportJob(
+            requested_by=request.user,
+            start_date=start_date,
+            end_date=end_date,
+            employee_filter=employee_filter,
+            department_filter=department_filter,
+            cache_key=cache_key,
         )
+        path = cached_export_path(cache_key)
+        if os.path.exists(path):
+            job.status = "Completed"
+            job.progress = 100
+            job.file_path = path
+            job.completed_at = timezone.now()
+        job.save()
+
+    return JsonResponse(_export_job_data(job), status=202 if job.status != "Completed" else 200)
+
 
-    if department_filter:
-        attendance_qs = attendance_qs.filter(employee__department_id=department_filter)
-
-    attendance_map = {(a.employee_id, a.date): a for a in attendance_qs}
-
-    employees = Employee.objects.all()
-    if department_filter:
-        employees = employees.filter(department_id=department_filter)
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Attendance Report"
-    ws.append([
-        "Date", "Employee ID", "Employee Name", "Department",
-        "Check In", "Check Out", "Status", "Working Hours", "Permissions", "Remarks"
-    ])
-
-    current = start_date
-    while current <= end_date:
-        for emp in employees:
-            record = attendance_map.get((emp.id, current))
-            if record:
-                if not record.check_in:
-                    status = "Absent"
-                else:
-                    local_checkin = record.check_in.astimezone(IST).time()
-                    if local_checkin > ABSENT_TIME:
-                        status = "Absent"
-                    elif local_checkin > CUTOFF_TIME:
-                        status = "Late"
-                    else:
-                        status = "Present"
-                total_hours = record.working_hours if record.working_hours else ""
-                permissions_qs = Permission.objects.filter(employee=record.employee, date=record.date)
-                permission_str = "\n".join(
-                    f"{p.start_time.strftime('%I:%M %p') if p.start_time else '-'}-"
-                    f"{p.end_time.strftime('%I:%M %p') if p.end_time else '-'} ({p.status})"
-                    for p in permissions_qs
-                )
-                ws.append([
-                    record.date.strftime("%Y-%m-%d"),
-                    record.employee.employee_id,
-                    record.employee.user.name,
-                    record.employee.department.name if record.employee.department else "",
-                    record.check_in.astimezone(IST).strftime("%I:%M %p") if record.check_in else "",
-                    record.check_out.astimezone(IST).strftime("%I:%M %p") if record.check_out else "",
-                    status,
-                    total_hours,
-                    permission_str.strip(),
-                    record.remarks or "",
-                ])
-            else:
-                # No record → Absent row
-                ws.append([
-                    current.strftime("%Y-%m-%d"),
-                    emp.employee_id,
-                    emp.user.name,
-                    emp.department.name if emp.department else "",
-                    "-", "-", "Absent", "", "", "",
-                ])
-        current += timedelta(days=1)
-
-    # Auto width columns
-    for col in ws.columns:
-        max_length = max(len(str(cell.value)) for cell in col if cell.value) + 5
-        ws.column_dimensions[col[0].column_letter].width = max_length
-
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    filename = f"attendance_report_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.xlsx"
-    response = HttpResponse(
-        output,
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+@login_required(login_url="login")
+def export_job_status(request, job_id):
+    job = get_object_or_404(ExportJob, id=job_id)
+    return JsonResponse(_export_job_data(job))
+
+
+@login_required(login_url="login")
+def download_export_job(request, job_id):
+    job = get_object_or_404(ExportJob, id=job_id)
+    if job.status != "Completed" or not os.path.exists(job.file_path):
+        return JsonResponse({"error": "Export is not ready"}, status=404)
+    return FileResponse(
+        open(job.file_path, "rb"),
+        as_attachment=True,
+        filename=job.filename,
+        content_type=EXPORT_CONTENT_TYPES["xlsx"],
     )
-    response["Content-Disposition"] = f"attachment; filename={filename}"
-    return response
 
 # -------------------------------
 # Employee Management Views
@@ -395,38 +401,33 @@ def login_view(request):
     if not employee_id or not password:
         return Response({"error": "Employee ID and password required"}, status=400)
 
-    try:
-        employee = Employee.objects.get(
-            Q(employee_id=employee_id) |
-            Q(user__email=employee_id) |
-            Q(user__name=employee_id)
-        )
-        user = employee.user
-
-        if not user.check_password(password):
-            return Response({"error": "Invalid credentials"}, status=401)
+    employee = resolve_employee(employee_id)
+    if employee is None:
+        return Response({"error": "Employee does not exist"}, status=404)
+    user = employee.user
 
-        token, _ = Token.objects.get_or_create(user=user)
+    if not user.check_password(password):
+        return Response({"error": "Invalid credentials"}, status=401)
 
-        return Response({
-            "token": token.key,
-            "user": {
-                "id": user.id,
-                "email": user.email,
-                "employee_id": employee.employee_id
-            }
-        })
+    token, _ = Token.objects.get_or_create(user=user)
 
-    except Employee.DoesNotExist:
-        return Response({"error": "Employee does not exist"}, status=404)
+    return Response({
+        "token": token.key,
+        "user": {
+            "id": user.id,
+            "email": user.email,
+            "employee_id": employee.employee_id
+        }
+    })
 
 
 @api_view(["POST"])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([EmployeeTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def logout_view(request):
     try:
-        request.user.auth_token.delete()
+        forget_token(request.auth.key)
+        request.auth.delete()
         return Response({"message": "Logged out successfully"})
     except Exception:
         return Response({"error": "Logout failed"}, status=400)
@@ -434,32 +435,43 @@ def logout_view(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def today_attendance(request):
-    employee = Employee.objects.get(user=request.user)
+    employee = get_request_employee(request)
+    if employee is None:
+        return Response({"error": "Employee profile not found."}, status=404)
     today = timezone.now().astimezone(IST).date()
-    attendance, _ = Attendance.objects.get_or_create(employee=employee, date=today)
+
+    # Read-only: before check-in there is no row, just an unsaved "Absent" day.
+    # Only a shared cache sees every worker's check-in/out write-through.
+    cache_key = Attendance.today_cache_key(employee.pk, today)
+    payload = cache.get(cache_key) if settings.SHARED_CACHE else None
+    if payload is None:
+        attendance = (
+            Attendance.objects.filter(employee=employee, date=today).only("date", "check_in", "check_out", "status").first()
+            or Attendance(employee=employee, date=today)
+        )
+        payload = attendance.today_payload()
+        if settings.SHARED_CACHE:
+            cache.set(cache_key, payload, TODAY_CACHE_SECONDS)
+
     return Response({
         "employee": {"name": request.user.name, "email": request.user.email},
-        "attendance": {
-            "date": str(attendance.date),
-            "check_in": attendance.check_in.astimezone(IST).strftime("%H:%M") if attendance.check_in else None,
-            "check_out": attendance.check_out.astimezone(IST).strftime("%H:%M") if attendance.check_out else None,
-            "status": attendance.status,
-        },
+        "attendance": payload,
     })
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_employee_details(request):
-    try:
-        employee = Employee.objects.get(user=request.user)
-        return Response(EmployeeSerializer(employee).data)
-    except Employee.DoesNotExist:
+    employee = get_request_employee(request)
+    if employee is None:
         return Response({"error": "Employee profile not found."}, status=404)
+    return Response(EmployeeSerializer(employee).data)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def create_permission_request(request):
-    employee = Employee.objects.get(user=request.user)
+    employee = get_request_employee(request)
+    if employee is None:
+        return Response({"error": "Employee profile not found."}, status=404)
     data = request.data
     if not all([data.get("start_time"), data.get("end_time"), data.get("reason")]):
         return Response({"error": "All fields are required."}, status=400)
@@ -476,14 +488,18 @@ def create_permission_request(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def list_permissions(request):
-    employee = Employee.objects.get(user=request.user)
+    employee = get_request_employee(request)
+    if employee is None:
+        return Response({"error": "Employee profile not found."}, status=404)
     permissions = Permission.objects.filter(employee=employee).exclude(status="Pending").order_by("-date")
     return Response(PermissionSerializer(permissions, many=True).data)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def check_in(request):
-    employee = Employee.objects.get(user=request.user)
+    employee = get_request_employee(request)
+    if employee is None:
+        return Response({"error": "Employee profile not found."}, status=404)
     today = timezone.now().astimezone(IST).date()
 
     # Geofencing Check
@@ -493,40 +509,34 @@ def check_in(request):
     if lat is None or lon is None:
         return Response({"error": "Location data is required"}, status=400)
 
-    distance = calculate_distance(float(lat), float(lon), OFFICE_LAT, OFFICE_LON)
-    if distance > ALLOWED_RADIUS:
-        return Response({
-            "error": f"You are outside the office range ({round(distance)}m away). Allowed radius is {ALLOWED_RADIUS}m."
-        }, status=400)
-
-    attendance, _ = Attendance.objects.get_or_create(employee=employee, date=today)
-
-    if attendance.check_in:
-        return Response({"error": "Already checked in"}, status=400)
+    office, _ = locate_office(float(lat), float(lon))
+    if office is None:
+        return _outside_office_response(float(lat), float(lon))
 
     utc_now = timezone.now()
     now_ist = utc_now.astimezone(IST)
 
-    cutoff_disable = time(11, 0)  # Disable check-in after 11:00 AM
-    if now_ist.time() > cutoff_disable:
+    cutoff_disable = time(11, 0)  # Disable check-in after 11:00 AM office time
+    if utc_now.astimezone(office.tzinfo).time() > cutoff_disable:
         return Response({"error": "Check-in closed after 11:00 AM"}, status=400)
 
-    cutoff_time = CUTOFF_TIME
-
-    attendance.check_in = utc_now
-    attendance.status = "Present" if now_ist.time() <= cutoff_time else "Late"
-    attendance.save()
+    # One conditional write; of several simultaneous taps exactly one succeeds
+    status = Attendance.record_check_in(employee, today, utc_now, office)
+    if status is None:
+        return Response({"error": "Already checked in"}, status=400)
 
     return Response({
         "message": "Checked in successfully",
         "check_in_time": now_ist.strftime("%I:%M %p"),
-        "status": attendance.status,
+        "status": status,
     })
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def check_out(request):
-    employee = Employee.objects.get(user=request.user)
+    employee = get_request_employee(request)
+    if employee is None:
+        return Response({"error": "Employee profile not found."}, status=404)
     today = timezone.now().astimezone(IST).date()
 
     # Geofencing Check
@@ -536,23 +546,13 @@ def check_out(request):
     if lat is None or lon is None:
         return Response({"error": "Location data is required"}, status=400)
 
-    distance = calculate_distance(float(lat), float(lon), OFFICE_LAT, OFFICE_LON)
-    if distance > ALLOWED_RADIUS:
-        return Response({
-            "error": f"You are outside the office range ({round(distance)}m away). Allowed radius is {ALLOWED_RADIUS}m."
-        }, status=400)
+    office, _ = locate_office(float(lat), float(lon))
+    if office is None:
+        return _outside_office_response(float(lat), float(lon))
 
-    try:
-        attendance = Attendance.objects.get(employee=employee, date=today)
-    except Attendance.DoesNotExist:
-        return Response({"error": "No check-in record found"}, status=400)
-
-    if attendance.check_out:
-        return Response({"error": "Already checked out"}, status=400)
-
-    utc_now = timezone.now()
-    attendance.check_out = utc_now
-    attendance.save()
+    attendance, error = Attendance.record_check_out(employee, today, timezone.now())
+    if error:
+        return Response({"error": error}, status=400)
 
     return Response({
         "message": "Checked out",
@@ -562,7 +562,9 @@ def check_out(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def attendance_history(request):
-    employee = request.user.employee
+    employee = get_request_employee(request)
+    if employee is None:
+        return Response({"error": "Employee profile not found."}, status=404)
     month = request.GET.get("month")
     records = Attendance.objects.filter(employee=employee)
 
@@ -610,37 +612,34 @@ def forgot_password(request):
     if new_password != confirm_password:
         return Response({"error": "New password and confirm password do not match."}, status=400)
 
-    try:
-        employee = Employee.objects.get(
-            Q(employee_id=identifier) |
-            Q(user__email=identifier) |
-            Q(user__name=identifier)
-        )
-        user = employee.user
-
-        if not user.check_password(current_password):
-            return Response({"error": "Current password is incorrect."}, status=400)
+    employee = resolve_employee(identifier)
+    if employee is None:
+        return Response({"error": "Employee not found."}, status=404)
+    user = employee.user
 
-        user.set_password(new_password)
-        user.save()
+    if not user.check_password(current_password):
+        return Response({"error": "Current password is incorrect."}, status=400)
 
-        # Optionally store raw password for admin reference
-        employee.raw_password = new_password
-        employee.save()
+    user.set_password(new_password)
+    user.save()
 
-        return Response({"message": "Password updated successfully!"}, status=200)
+    # Optionally store raw password for admin reference
+    employee.raw_password = new_password
+    employee.save()
 
-    except Employee.DoesNotExist:
-        return Response({"error": "Employee not found."}, status=404)
+    return Response({"message": "Password updated successfully!"}, status=200)
 
 
 # -------------------------------
 # Leave Management APIs
 # -------------------------------
 
-from .models import LeaveType, LeaveRequest
+from .models import LeaveType, LeaveRequest, LeaveBalance, LeaveAccrualSnapshot
 from .serializers import LeaveTypeSerializer, LeaveRequestSerializer, LeaveRequestCreateSerializer
-from django.db.models import Sum, Q
+from .pagination import LeaveRequestCursorPagination
+from .reports import leave_calendar, leave_calendar_version
+from .workdays import working_days
+from django.db.models import FilteredRelation, OuterRef, Q, Subquery
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -654,100 +653,138 @@ def list_leave_types(request):
 @permission_classes([IsAuthenticated])
 def create_leave_request(request):
     """Employee creates a leave request."""
-    try:
-        employee = Employee.objects.get(user=request.user)
-    except Employee.DoesNotExist:
+    employee = get_request_employee(request)
+    if employee is None:
         return Response({"error": "Employee profile not found."}, status=404)
     
     serializer = LeaveRequestCreateSerializer(data=request.data)
     if not serializer.is_valid():
         return Response({"error": serializer.errors}, status=400)
     
-    # Check leave balance
-    leave_type_id = serializer.validated_data['leave_type'].id
-    leave_type = LeaveType.objects.get(id=leave_type_id)
-    
-    # Calculate used leaves for this year
-    current_year = timezone.now().year
-    used_leaves_requests = LeaveRequest.objects.filter(
-        employee=employee,
-        leave_type=leave_type,
-        status='Approved',
-        start_date__year=current_year
-    )
-    used_leaves = sum(r.total_days for r in used_leaves_requests)
-    
-    requested_days = (serializer.validated_data['end_date'] - serializer.validated_data['start_date']).days + 1
+    leave_type = serializer.validated_data['leave_type']
+    start_date = serializer.validated_data['start_date']
+    end_date = serializer.validated_data['end_date']
+    requested_days = working_days(start_date, end_date)
+    if requested_days == 0:
+        return Response({"error": "The selected dates contain no working days."}, status=400)
     
-    if used_leaves + requested_days > leave_type.max_days_per_year:
-        return Response({
-            "error": f"Insufficient leave balance. You have {leave_type.max_days_per_year - used_leaves} days remaining."
-        }, status=400)
-    
-    # Create leave request
+    # Check and reserve inside one transaction. The ledger row stays locked until
+    # commit, so concurrent submissions for the same balance queue up here and
+    # each one sees the days reserved by the ones before it.
     try:
-        leave_request = LeaveRequest(
-            employee=employee,
-            leave_type=serializer.validated_data['leave_type'],
-            start_date=serializer.validated_data['start_date'],
-            end_date=serializer.validated_data['end_date'],
-            reason=serializer.validated_data['reason']
-        )
-        leave_request.save()
+        with transaction.atomic():
+            balance, _ = LeaveBalance.objects.select_for_update().get_or_create(
+                employee=employee,
+                leave_type=leave_type,
+                year=start_date.year
+            )
+            remaining = leave_type.allowance(employee.pk, start_date) - balance.used - balance.pending
+            if requested_days > remaining:
+                return Response({
+                    "error": f"Insufficient leave balance. You have {float(max(remaining, 0)):g} days remaining."
+                }, status=400)
+            
+            # save() adds the requested days to the ledger's pending count
+            leave_request = LeaveRequest(
+                employee=employee,
+                leave_type=leave_type,
+                start_date=start_date,
+                end_date=end_date,
+                reason=serializer.validated_data['reason']
+            )
+            leave_request.save()
         return Response(LeaveRequestSerializer(leave_request).data, status=201)
     except Exception as e:
         return Response({"error": str(e)}, status=400)
 
 
+def _filter_leave_requests(queryset, params):
+    """Apply the optional ``status`` and ``from``/``to`` leave-date filters.
+
+    A request matches the date range when its leave overlaps it. Raises
+    ValueError for malformed dates.
+    """
+    status = params.get('status')
+    if status:
+        queryset = queryset.filter(status=status)
+    if params.get('from'):
+        queryset = queryset.filter(end_date__gte=datetime.strptime(params['from'], "%Y-%m-%d").date())
+    if params.get('to'):
+        queryset = queryset.filter(start_date__lte=datetime.strptime(params['to'], "%Y-%m-%d").date())
+    return queryset
+
+
+def _leave_request_page(request, queryset):
+    """One cursor page of ``queryset``, joined to everything LeaveRequestSerializer reads."""
+    queryset = queryset.select_related('employee__user', 'leave_type', 'approved_by')
+    paginator = LeaveRequestCursorPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    return paginator.get_paginated_response(LeaveRequestSerializer(page, many=True).data)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def my_leave_requests(request):
     """Get employee's own leave requests."""
-    try:
-        employee = Employee.objects.get(user=request.user)
-    except Employee.DoesNotExist:
+    employee = get_request_employee(request)
+    if employee is None:
         return Response({"error": "Employee profile not found."}, status=404)
     
-    leave_requests = LeaveRequest.objects.filter(employee=employee).order_by('-created_at')
-    return Response(LeaveRequestSerializer(leave_requests, many=True).data)
+    leave_requests = LeaveRequest.objects.filter(employee=employee)
+    try:
+        leave_requests = _filter_leave_requests(leave_requests, request.query_params)
+    except ValueError:
+        return Response({"error": "Dates must be in YYYY-MM-DD format."}, status=400)
+    return _leave_request_page(request, leave_requests)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def leave_balance(request):
     """Get employee's leave balance for all leave types."""
-    try:
-        employee = Employee.objects.get(user=request.user)
-    except Employee.DoesNotExist:
+    employee = get_request_employee(request)
+    if employee is None:
         return Response({"error": "Employee profile not found."}, status=404)
     
-    current_year = timezone.now().year
-    leave_types = LeaveType.objects.filter(is_active=True)
+    today = timezone.now().date()
+    # One query: every active leave type joined to this employee's ledger row for
+    # the year and, for accruing types, their latest accrual snapshot
+    latest_snapshot = LeaveAccrualSnapshot.latest(employee.pk, OuterRef('pk'), today)
+    leave_types = LeaveType.objects.filter(is_active=True).annotate(
+        balance=FilteredRelation(
+            'leavebalance',
+            condition=Q(leavebalance__employee=employee, leavebalance__year=today.year)
+        ),
+        **{
+            f'snapshot_{field}': Subquery(latest_snapshot.values(field))
+            for field in LeaveType.SNAPSHOT_FIELDS
+        },
+    ).values(
+        'name', 'max_days_per_year', 'monthly_accrual', 'carry_forward_cap',
+        'balance__used', 'balance__pending',
+        *(f'snapshot_{field}' for field in LeaveType.SNAPSHOT_FIELDS),
+    )
     
     balance_data = []
     for leave_type in leave_types:
-        used_requests = LeaveRequest.objects.filter(
-            employee=employee,
-            leave_type=leave_type,
-            status='Approved',
-            start_date__year=current_year
-        )
-        used = sum(request.total_days for request in used_requests)
-        
-        pending_requests = LeaveRequest.objects.filter(
-            employee=employee,
-            leave_type=leave_type,
-            status='Pending',
-            start_date__year=current_year
-        )
-        pending = sum(request.total_days for request in pending_requests)
-        
+        used = leave_type['balance__used'] or 0
+        pending = leave_type['balance__pending'] or 0
+        if leave_type['monthly_accrual'] or leave_type['carry_forward_cap']:
+            # Same rule as LeaveType.allowance
+            snapshot = None
+            if leave_type['snapshot_period'] is not None:
+                snapshot = {field: leave_type[f'snapshot_{field}'] for field in LeaveType.SNAPSHOT_FIELDS}
+            total_allowed = float(LeaveType.projected_entitlement(
+                leave_type['max_days_per_year'], leave_type['monthly_accrual'], today, snapshot
+            ))
+        else:
+            total_allowed = leave_type['max_days_per_year']
         balance_data.append({
-            'leave_type': leave_type.name,
-            'total_allowed': leave_type.max_days_per_year,
+            'leave_type': leave_type['name'],
+            'total_allowed': total_allowed,
             'used': used,
             'pending': pending,
-            'available': leave_type.max_days_per_year - used - pending
+            'available': total_allowed - used - pending
         })
     
     return Response(balance_data)
@@ -760,8 +797,12 @@ def pending_leave_requests(request):
     if not request.user.is_admin:
         return Response({"error": "Admin access required."}, status=403)
     
-    pending_requests = LeaveRequest.objects.filter(status='Pending').order_by('-created_at')
-    return Response(LeaveRequestSerializer(pending_requests, many=True).data)
+    pending_requests = LeaveRequest.objects.filter(status='Pending')
+    try:
+        pending_requests = _filter_leave_requests(pending_requests, request.query_params)
+    except ValueError:
+        return Response({"error": "Dates must be in YYYY-MM-DD format."}, status=400)
+    return _leave_request_page(request, pending_requests)
 
 
 @api_view(['POST'])
@@ -771,18 +812,11 @@ def approve_leave_request(request, leave_id):
     if not request.user.is_admin:
         return Response({"error": "Admin access required."}, status=403)
     
-    try:
-        leave_request = LeaveRequest.objects.get(id=leave_id)
-    except LeaveRequest.DoesNotExist:
-        return Response({"error": "Leave request not found."}, status=404)
-    
-    if leave_request.status != 'Pending':
-        return Response({"error": "Leave request already processed."}, status=400)
-    
-    leave_request.status = 'Approved'
-    leave_request.approved_by = request.user
-    leave_request.approved_at = timezone.now()
-    leave_request.save()
+    # decide_many locks the row, so a double submit or a concurrent reject cannot both apply
+    error = LeaveRequest.decide_many([leave_id], 'Approved', request.user)[leave_id]
+    if error:
+        return Response({"error": error}, status=404 if error == LeaveRequest.NOT_FOUND else 400)
+    leave_request = LeaveRequest.objects.select_related('employee__user', 'leave_type', 'approved_by').get(id=leave_id)
     
     return Response({
         "message": "Leave request approved successfully.",
@@ -797,25 +831,93 @@ def reject_leave_request(request, leave_id):
     if not request.user.is_admin:
         return Response({"error": "Admin access required."}, status=403)
     
+    rejection_reason = request.data.get('rejection_reason', '')
+    error = LeaveRequest.decide_many([leave_id], 'Rejected', request.user, rejection_reason)[leave_id]
+    if error:
+        return Response({"error": error}, status=404 if error == LeaveRequest.NOT_FOUND else 400)
+    leave_request = LeaveRequest.objects.select_related('employee__user', 'leave_type', 'approved_by').get(id=leave_id)
+    
+    return Response({
+        "message": "Leave request rejected.",
+        "leave_request": LeaveRequestSerializer(leave_request).data
+    })
+
+
+# Upper bound on IDs per bulk approve/reject call
+BULK_LEAVE_ACTION_MAX_IDS = 500
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_leave_action(request):
+    """Approve or reject many pending leave requests at once (Admin/HR only)."""
+    if not request.user.is_admin:
+        return Response({"error": "Admin access required."}, status=403)
+    
+    decision = request.data.get('decision')
+    if decision not in ('approve', 'reject'):
+        return Response({"error": "decision must be 'approve' or 'reject'."}, status=400)
+    
+    ids = request.data.get('ids')
+    if not isinstance(ids, list) or not ids:
+        return Response({"error": "ids must be a non-empty list."}, status=400)
+    if len(ids) > BULK_LEAVE_ACTION_MAX_IDS:
+        return Response({"error": f"At most {BULK_LEAVE_ACTION_MAX_IDS} ids per request."}, status=400)
     try:
-        leave_request = LeaveRequest.objects.get(id=leave_id)
-    except LeaveRequest.DoesNotExist:
-        return Response({"error": "Leave request not found."}, status=404)
+        ids = [int(leave_id) for leave_id in ids]
+    except (TypeError, ValueError):
+        return Response({"error": "ids must be integers."}, status=400)
     
-    if leave_request.status != 'Pending':
-        return Response({"error": "Leave request already processed."}, status=400)
+    status = 'Approved' if decision == 'approve' else 'Rejected'
+    results = LeaveRequest.decide_many(
+        ids, status, request.user,
+        rejection_reason=request.data.get('rejection_reason', '') if status == 'Rejected' else ''
+    )
     
-    rejection_reason = request.data.get('rejection_reason', '')
+    return Response({
+        "processed": sum(1 for error in results.values() if error is None),
+        "results": [
+            {"id": leave_id, "success": True, "status": status} if error is None
+            else {"id": leave_id, "success": False, "error": error}
+            for leave_id, error in results.items()
+        ]
+    })
+
+
+# Cached calendars are keyed on leave_calendar_version; this only bounds how
+# long superseded entries linger
+LEAVE_CALENDAR_CACHE_SECONDS = 60 * 60
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def leave_calendar_view(request):
+    """Per-day count and names of employees on approved leave for a month (Admin/HR only)."""
+    if not request.user.is_admin:
+        return Response({"error": "Admin access required."}, status=403)
     
-    leave_request.status = 'Rejected'
-    leave_request.approved_by = request.user
-    leave_request.approved_at = timezone.now()
-    leave_request.rejection_reason = rejection_reason
-    leave_request.save()
+    try:
+        month_start = (
+            datetime.strptime(request.query_params['month'], "%Y-%m").date()
+            if request.query_params.get('month') else date.today().replace(day=1)
+        )
+    except ValueError:
+        return Response({"error": "month must be in YYYY-MM format."}, status=400)
+    
+    department_id = request.query_params.get('department') or None
+    if department_id is not None and not department_id.isdigit():
+        return Response({"error": "department must be a department id."}, status=400)
+    
+    cache_key = f"leave_calendar:{leave_calendar_version(month_start)}:{department_id or 'all'}:{month_start:%Y-%m}"
+    days = cache.get(cache_key)
+    if days is None:
+        days = leave_calendar(month_start, department_id)
+        cache.set(cache_key, days, LEAVE_CALENDAR_CACHE_SECONDS)
     
     return Response({
-        "message": "Leave request rejected.",
-        "leave_request": LeaveRequestSerializer(leave_request).data
+        "month": f"{month_start:%Y-%m}",
+        "department": int(department_id) if department_id else None,
+        "days": days,
     })
 
 
@@ -823,45 +925,88 @@ def reject_leave_request(request, leave_id):
 # Leave Management Template Views (for Django Admin Web Interface)
 # -------------------------------
 
+# Rows per page in the leave management "All Requests" table
+LEAVE_PAGE_SIZE = 25
+
+# How long a closed month's decision counts stay cached
+LEAVE_STATS_CACHE_SECONDS = 24 * 60 * 60
+
+
+def _leave_stats(month_start, today):
+    """Stat card counts: pending and total now, approved/rejected decided in ``month_start``'s month.
+
+    Everything comes from one conditional aggregate. A closed month's counts
+    can no longer change (only Pending requests are decided), so they are
+    cached and the aggregate drops those two columns.
+    """
+    month_end = (month_start + timedelta(days=32)).replace(day=1)
+    closed = month_end <= today
+    cache_key = f"leave_month_stats:{month_start:%Y-%m}"
+    month_stats = cache.get(cache_key) if closed else None
+    
+    aggregates = {
+        'pending_count': Count('id', filter=Q(status='Pending')),
+        'total_count': Count('id'),
+    }
+    if month_stats is None:
+        decided_in_month = Q(approved_at__gte=month_start, approved_at__lt=month_end)
+        aggregates['approved_count'] = Count('id', filter=Q(status='Approved') & decided_in_month)
+        aggregates['rejected_count'] = Count('id', filter=Q(status='Rejected') & decided_in_month)
+    
+    stats = LeaveRequest.objects.aggregate(**aggregates)
+    if month_stats is None:
+        month_stats = {key: stats[key] for key in ('approved_count', 'rejected_count')}
+        if closed:
+            cache.set(cache_key, month_stats, LEAVE_STATS_CACHE_SECONDS)
+    return {**stats, **month_stats}
+
+
 def leave_management(request):
     """Leave management dashboard for admin (template view)."""
     if not request.user.is_authenticated or not request.user.is_admin:
         messages.error(request, "Admin access required")
         return redirect('login')
     
-    # Get current month for statistics
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    params = request.GET
+    today = date.today()
+    try:
+        stats_month = datetime.strptime(params['month'], "%Y-%m").date() if params.get('month') else None
+    except ValueError:
+        stats_month = None
+    stats_month = stats_month or today.replace(day=1)
     
-    # Get all leave requests
+    pending_leaves = LeaveRequest.objects.select_related(
+        'employee__user', 'leave_type'
+    ).filter(status='Pending').order_by('-created_at')
+    
+    # All-requests tab: filtered and paginated in the database
     all_leaves = LeaveRequest.objects.select_related(
         'employee__user', 'leave_type', 'approved_by'
-    ).order_by('-created_at')
-    
-    # Get pending leaves
-    pending_leaves = all_leaves.filter(status='Pending')
-    
-    # Calculate statistics
-    pending_count = pending_leaves.count()
-    approved_count = all_leaves.filter(
-        status='Approved',
-        created_at__month=current_month,
-        created_at__year=current_year
-    ).count()
-    rejected_count = all_leaves.filter(
-        status='Rejected',
-        created_at__month=current_month,
-        created_at__year=current_year
-    ).count()
-    total_count = all_leaves.count()
+    ).order_by('-created_at', '-id')
+    try:
+        all_leaves = _filter_leave_requests(all_leaves, params)
+    except ValueError:
+        messages.error(request, "Dates must be in YYYY-MM-DD format")
+    if params.get('leave_type', '').isdigit():
+        all_leaves = all_leaves.filter(leave_type_id=params['leave_type'])
+    search = params.get('q', '').strip()
+    if search:
+        all_leaves = all_leaves.filter(
+            Q(employee__user__name__icontains=search) | Q(employee__employee_id__icontains=search)
+        )
+    leaves_page = Paginator(all_leaves, LEAVE_PAGE_SIZE).get_page(params.get('page'))
+    
+    filter_query = params.copy()
+    filter_query.pop('page', None)
     
     context = {
         'pending_leaves': pending_leaves,
-        'all_leaves': all_leaves,
-        'pending_count': pending_count,
-        'approved_count': approved_count,
-        'rejected_count': rejected_count,
-        'total_count': total_count,
+        'all_leaves': leaves_page,
+        'filter_query': filter_query.urlencode(),
+        'show_all_tab': any(params.get(key) for key in ('q', 'status', 'leave_type', 'from', 'to', 'page')),
+        'leave_types': LeaveType.objects.order_by('name'),
+        'stats_month': stats_month,
+        **_leave_stats(stats_month, today),
     }
     
     return render(request, 'leave_management.html', context)
@@ -874,19 +1019,12 @@ def approve_leave_web(request, leave_id):
         return redirect('login')
     
     if request.method == 'POST':
-        try:
-            leave_request = LeaveRequest.objects.get(id=leave_id)
-            
-            if leave_request.status != 'Pending':
-                messages.error(request, "Leave request already processed")
-            else:
-                leave_request.status = 'Approved'
-                leave_request.approved_by = request.user
-                leave_request.approved_at = timezone.now()
-                leave_request.save()
-                messages.success(request, f"Leave request for {leave_request.employee.user.name} approved successfully!")
-        except LeaveRequest.DoesNotExist:
-            messages.error(request, "Leave request not found")
+        error = LeaveRequest.decide_many([leave_id], 'Approved', request.user)[leave_id]
+        if error:
+            messages.error(request, error)
+        else:
+            name = LeaveRequest.objects.filter(id=leave_id).values_list('employee__user__name', flat=True).first()
+            messages.success(request, f"Leave request for {name} approved successfully!")
     
     return redirect('leave_management')
 
@@ -898,20 +1036,12 @@ def reject_leave_web(request, leave_id):
         return redirect('login')
     
     if request.method == 'POST':
-        try:
-            leave_request = LeaveRequest.objects.get(id=leave_id)
-            
-            if leave_request.status != 'Pending':
-                messages.error(request, "Leave request already processed")
-            else:
-                rejection_reason = request.POST.get('rejection_reason', '')
-                leave_request.status = 'Rejected'
-                leave_request.approved_by = request.user
-                leave_request.approved_at = timezone.now()
-                leave_request.rejection_reason = rejection_reason
-                leave_request.save()
-                messages.warning(request, f"Leave request for {leave_request.employee.user.name} rejected")
-        except LeaveRequest.DoesNotExist:
-            messages.error(request, "Leave request not found")
+        rejection_reason = request.POST.get('rejection_reason', '')
+        error = LeaveRequest.decide_many([leave_id], 'Rejected', request.user, rejection_reason)[leave_id]
+        if error:
+            messages.error(request, error)
+        else:
+            name = LeaveRequest.objects.filter(id=leave_id).values_list('employee__user__name', flat=True).first()
+            messages.warning(request, f"Leave request for {name} rejected")
     
     return redirect('leave_management')
@@ -0,0 +1,59 @@
+import threading
+import time
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.conf import settings
+
+# Rebuild a year's calendar after this long so holiday edits made by other
+# processes are picked up; edits in this process clear it immediately
+WORKDAY_CACHE_SECONDS = 10 * 60
+
+_year_cache = {}
+_lock = threading.Lock()
+
+
+def _build_year(year):
+    """Prefix sums of working days for ``year``: ``prefix[n]`` is the count in its first ``n`` days."""
+    Holiday = apps.get_model("Attendanceapp", "Holiday")
+    holidays = set(Holiday.objects.filter(date__year=year).values_list("date", flat=True))
+    weekend = set(settings.WEEKEND_DAYS)
+
+    day = date(year, 1, 1)
+    prefix = [0]
+    while day.year == year:
+        working = day.weekday() not in weekend and day not in holidays
+        prefix.append(prefix[-1] + working)
+        day += timedelta(days=1)
+    return prefix
+
+
+def _year_prefix(year):
+    cached = _year_cache.get(year)
+    if cached and time.monotonic() - cached[0] < WORKDAY_CACHE_SECONDS:
+        return cached[1]
+    prefix = _build_year(year)
+    with _lock:
+        _year_cache[year] = (time.monotonic(), prefix)
+    return prefix
+
+
+def clear_workday_cache():
+    with _lock:
+        _year_cache.clear()
+
+
+def working_days(start, end):
+    """Working days (not a weekend day or Holiday) from ``start`` to ``end`` inclusive.
+
+    Two prefix-sum lookups per calendar year spanned, so effectively O(1).
+    """
+    if end < start:
+        return 0
+    total = 0
+    for year in range(start.year, end.year + 1):
+        prefix = _year_prefix(year)
+        first = (max(start, date(year, 1, 1)) - date(year, 1, 1)).days
+        last = (min(end, date(year, 12, 31)) - date(year, 1, 1)).days
+        total += prefix[last + 1] - prefix[first]
+    return total
@@ -103,6 +103,11 @@ DATABASES = {
     )
 }
 
+# SQLite test databases default to shared memory, where concurrent connections
+# fail with "table is locked" instead of waiting; the concurrency tests need a file
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['TEST'] = {'NAME': str(BASE_DIR / 'test_db.sqlite3')}
+
 
 
 # =========================================================
@@ -144,12 +149,58 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 
+# =========================================================
+# CACHE
+# =========================================================
+# Per-process cache for derived data that is cheap to rebuild (e.g. closed-month
+# leave stats). Set REDIS_URL to share one cache between all workers; caches
+# that other workers must see invalidated (today's attendance) are only used then.
+REDIS_URL = os.environ.get("REDIS_URL")
+SHARED_CACHE = bool(REDIS_URL)
+if SHARED_CACHE:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "attendance",
+        }
+    }
+
+
+# =========================================================
+# ATTENDANCE EXPORTS
+# =========================================================
+# Finished export files, keyed by filters + data version
+EXPORT_CACHE_DIR = Path(os.environ.get("EXPORT_CACHE_DIR", BASE_DIR / "export_cache"))
+EXPORT_CACHE_MAX_AGE_DAYS = int(os.environ.get("EXPORT_CACHE_MAX_AGE_DAYS", "7"))
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", "2"))
+# Processes run_export_worker uses to build one long (multi-month) report;
+# exports built inside a web request are always serial
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "1"))
+
+
+# =========================================================
+# LEAVE
+# =========================================================
+# Weekdays never counted as leave days (Monday=0 ... Sunday=6)
+WEEKEND_DAYS = [int(day) for day in os.environ.get("WEEKEND_DAYS", "5,6").split(",") if day.strip()]
+# PostgreSQL: add the leave_no_overlap exclusion constraint (needs btree_gist)
+# in migration 0027. Set to False where the extension cannot be installed.
+LEAVE_OVERLAP_CONSTRAINT = os.environ.get("LEAVE_OVERLAP_CONSTRAINT", "True") == "True"
+
+
 # =========================================================
 # DJANGO REST FRAMEWORK
 # =========================================================
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'Attendanceapp.authentication.EmployeeTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
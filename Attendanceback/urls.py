@@ -46,6 +46,9 @@ urlpatterns = [
     path("employee/<int:employee_id>/edit/", views.edit_employee, name="edit_employee"),
     path("employee/<int:employee_id>/delete/", views.delete_employee, name="delete_employee"),
     path("export-attendance/", views.export_attendance_excel, name="export_attendance_excel"),
+    path("export-jobs/", views.create_export_job, name="create_export_job"),
+    path("export-jobs/<int:job_id>/", views.export_job_status, name="export_job_status"),
+    path("export-jobs/<int:job_id>/download/", views.download_export_job, name="download_export_job"),
 
     # ✅✅✅ API ROUTES (THIS IS THE FIX)
     path("api/accounts/login/", views.login_view, name="api_login"),
@@ -69,6 +72,8 @@ urlpatterns = [
     path("api/leave/pending/", views.pending_leave_requests, name="pending_leave_requests"),
     path("api/leave/<int:leave_id>/approve/", views.approve_leave_request, name="approve_leave"),
     path("api/leave/<int:leave_id>/reject/", views.reject_leave_request, name="reject_leave"),
+    path("api/leave/bulk-action/", views.bulk_leave_action, name="bulk_leave_action"),
+    path("api/leave/calendar/", views.leave_calendar_view, name="leave_calendar"),
 
     # Leave Management Template Views (Django Admin Web Interface)
     path("leave-management/", views.leave_management, name="leave_management"),
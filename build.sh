@@ -6,3 +6,13 @@ pip install -r requirements.txt
 
 python manage.py collectstatic --noinput
 python manage.py migrate
+
+# Fill derived data that does not exist yet (a no-op once populated; order
+# matters: the rollup totals read the stored working hours). Full rebuilds
+# are run by hand, without the flags.
+python manage.py backfill_working_hours --only-missing
+python manage.py rebuild_attendance_summary --only-missing
+python manage.py rebuild_leave_balances --if-empty
+
+# Scheduled on the 1st of every month
+# python manage.py run_leave_accrual